@@ -1,11 +1,11 @@
-from flask import Flask, current_app
+from flask import Flask, jsonify
 from flask_migrate import Migrate  # Import Flask-Migrate for database migrations
-from config import Config  # Ensure this imports the Config class you created
+from config import Config, config_store  # Ensure this imports the Config class you created
 from app.extensions import db, login_manager  # Import db and login_manager from extensions
 from flask_wtf.csrf import CSRFProtect
-from apscheduler.schedulers.background import BackgroundScheduler  # Import APScheduler
-from app.routes.web_routes import generate_recommendations, process_requests  # Adjust import paths if needed
 from app.routes.request_processing_routes import request_processing_bp
+from app.helpers.registry import HelperUnavailable
+from app.helpers.db_engine import engine_options, configure_engine
 import logging
 from logging.handlers import RotatingFileHandler
 import os
@@ -13,7 +13,15 @@ import os
 csrf = CSRFProtect()
 migrate = Migrate()  # Initialize Flask-Migrate
 
-def create_app():
+def create_app(start_scheduler=None):
+    """
+    Create the Flask application.
+
+    Args:
+        start_scheduler (bool): Start the background job scheduler in this process.
+            Defaults to Scheduler.run_in_web from config.yaml; worker.py passes False
+            and runs the scheduler itself.
+    """
     app = Flask(__name__)
 
     # Initialize CSRF protection after app creation
@@ -23,49 +31,37 @@ def create_app():
     config = Config()
     app.config['SQLALCHEMY_DATABASE_URI'] = config.SQLALCHEMY_DATABASE_URI
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = config.SQLALCHEMY_TRACK_MODIFICATIONS
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(config.sections['Database'])
     app.config['SECRET_KEY'] = config.SECRET_KEY
 
     # Initialize extensions
     db.init_app(app)
+    with app.app_context():
+        configure_engine(db.engine, config.sections['Database'])
     migrate.init_app(app, db)  # Attach Flask-Migrate to the app
     login_manager.init_app(app)
     login_manager.login_view = 'user_routes.login'
 
-    # Add the user_loader callback
+    # Add the user_loader callback; users are served from a short-lived process-local cache
     @login_manager.user_loader
     def load_user(user_id):
-        from app.models import User  # Import User here to avoid circular import issues
-        return User.query.get(int(user_id))
-
-    # Initialize the scheduler
-    scheduler = BackgroundScheduler()
+        from app.helpers.user_cache import user_cache  # Import here to avoid circular import issues
+        return user_cache.load(int(user_id))
 
-    # Define the task functions
-    def daily_recommendations_task():
-        with app.app_context():  # Ensure the task runs within the app context
-            try:
-                generate_recommendations()
-            except Exception as e:
-                current_app.logger.error(f"Error running daily_recommendations_task: {e}")
+    # Pick up config.yaml edits; the mtime check is throttled inside the store
+    @app.before_request
+    def reload_config():
+        config_store.current()
 
-    def process_pending_requests_task():
-        with app.app_context():  # Ensure the task runs within the app context
-            try:
-                # Call the processing function directly (imported at the top of this file)
-                from app.routes.request_processing_routes import process_requests_with_jackett_and_qbittorrent
-                process_requests_with_jackett_and_qbittorrent()
-            except Exception as e:
-                current_app.logger.error(f"Error running process_pending_requests_task: {e}")
-
-    # Schedule the tasks
-    scheduler.add_job(daily_recommendations_task, 'interval', days=1)
-    scheduler.add_job(process_pending_requests_task, 'interval', minutes=5)
-    scheduler.start()
+    @app.errorhandler(HelperUnavailable)
+    def helper_unavailable(error):
+        return jsonify({"error": str(error)}), 503
 
     with app.app_context():
         # Import and register your blueprints/routes here
         from .routes import media_routes, user_routes, request_routes, notification_routes, web_routes, auth_routes
         from app.routes.jellyfin_routes import jellyfin_bp
+        from app.routes.job_routes import job_bp
         app.register_blueprint(auth_routes.auth_bp)
         app.register_blueprint(media_routes.bp)
         app.register_blueprint(user_routes.bp)
@@ -73,11 +69,19 @@ def create_app():
         app.register_blueprint(notification_routes.bp)
         app.register_blueprint(web_routes.bp)
         app.register_blueprint(jellyfin_bp)
+        csrf.exempt('app.routes.jellyfin_routes.jellyfin_webhook')  # Called by the Jellyfin webhook plugin
         app.register_blueprint(request_processing_bp)
+        app.register_blueprint(job_bp)
 
         # Create database tables if they don't exist
         db.create_all()
 
+    if start_scheduler is None:
+        start_scheduler = config.sections['Scheduler'].run_in_web
+    if start_scheduler:
+        from app.tasks.schedule_task import start_scheduler as start_job_scheduler
+        start_job_scheduler(app)
+
     return app
 
 def configure_logging():
@@ -0,0 +1,91 @@
+import asyncio
+import atexit
+import logging
+import threading
+import aiohttp
+from config import Config
+
+logging.basicConfig(level=logging.INFO)
+
+# Seconds an outbound call may take when the caller gives no timeout
+DEFAULT_TIMEOUT = 30
+
+
+class AsyncEngine:
+    """
+    One asyncio event loop per process, running in a daemon thread, for outbound HTTP calls.
+
+    Helpers define coroutines that use session(); the request pipeline's lookup stages
+    (TMDb and Jackett) schedule them with submit() and collect the results as the
+    futures complete. Every lookup shares one aiohttp session, so hundreds of concurrent
+    calls cost one thread and one connection pool rather than a thread each. The loop
+    starts on first use.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+        self._session = None
+
+    @property
+    def loop(self):
+        """The engine's event loop, started on first access."""
+        if self._loop is None:
+            with self._lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    self._thread = threading.Thread(target=self._run_loop, args=(loop,), name='async-engine', daemon=True)
+                    self._thread.start()
+                    self._loop = loop
+                    atexit.register(self.shutdown)
+        return self._loop
+
+    @staticmethod
+    def _run_loop(loop):
+        asyncio.set_event_loop(loop)
+        loop.run_forever()
+
+    async def session(self):
+        """Return the shared aiohttp session. Only call this from coroutines running on the engine."""
+        if self._session is None or self._session.closed:
+            settings = Config().sections['Async']
+            connector = aiohttp.TCPConnector(limit=settings.connections, limit_per_host=settings.connections_per_host)
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    async def get_json(self, url, params=None, headers=None, timeout=DEFAULT_TIMEOUT):
+        """
+        GET ``url`` and decode the JSON body.
+
+        Raises:
+            aiohttp.ClientError: On connection errors and non-2xx responses.
+            asyncio.TimeoutError: If no response arrives within ``timeout`` seconds.
+        """
+        session = await self.session()
+        async with session.get(url, params=params, headers=headers, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+            response.raise_for_status()
+            return await response.json(content_type=None)
+
+    def submit(self, coro):
+        """Schedule ``coro`` on the engine and return a concurrent.futures.Future for its result."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def shutdown(self):
+        """Close the shared session and stop the loop."""
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        if self._session is not None:
+            try:
+                asyncio.run_coroutine_threadsafe(self._session.close(), loop).result(5)
+            except Exception as e:
+                logging.error(f"Error closing the async HTTP session: {e}")
+            self._session = None
+        loop.call_soon_threadsafe(loop.stop)
+        self._thread.join(5)
+
+
+# Shared per-process engine; the pipeline runs helpers' async lookups on its loop
+engine = AsyncEngine()
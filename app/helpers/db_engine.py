@@ -0,0 +1,58 @@
+import logging
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+logging.basicConfig(level=logging.INFO)
+
+
+def is_sqlite(uri):
+    return make_url(uri).get_backend_name() == 'sqlite'
+
+
+def engine_options(settings):
+    """
+    Build SQLALCHEMY_ENGINE_OPTIONS for the database in ``settings``.
+
+    Server databases get the configured pool: pre-ping replaces connections the server
+    dropped (MySQL closes idle ones after wait_timeout) and recycling retires them before
+    that happens. SQLite keeps SQLAlchemy's pool defaults; its tuning is done with
+    pragmas by configure_engine().
+
+    Args:
+        settings (DatabaseSettings): Database section of config.yaml.
+
+    Returns:
+        dict: Keyword arguments for create_engine.
+    """
+    if is_sqlite(settings.uri):
+        return {}
+    return {
+        'pool_size': settings.pool_size,
+        'max_overflow': settings.max_overflow,
+        'pool_timeout': settings.pool_timeout,
+        'pool_recycle': settings.pool_recycle,
+        'pool_pre_ping': settings.pool_pre_ping,
+    }
+
+
+def configure_engine(engine, settings):
+    """Set the configured pragmas on every new connection of a SQLite ``engine``. Other databases are left as they are."""
+    if engine.dialect.name != 'sqlite':
+        return
+    pragmas = (
+        f"PRAGMA journal_mode={settings.sqlite_journal_mode.upper()}",
+        f"PRAGMA synchronous={settings.sqlite_synchronous.upper()}",
+        f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}",
+        f"PRAGMA mmap_size={int(settings.sqlite_mmap_size)}",
+    )
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+    logging.info(f"SQLite connections use: {'; '.join(pragmas)}.")
@@ -0,0 +1,107 @@
+import logging
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from config import Config, config_store
+
+logging.basicConfig(level=logging.INFO)
+
+class ServiceSession(requests.Session):
+    """
+    Session handed to clients that keep the session they are given (spotipy, MSAL).
+
+    Every request is sent through the factory's current session for the service, so
+    these clients use the rebuilt session after an Http config change and their calls
+    are counted in stats(). It subclasses requests.Session because spotipy replaces
+    anything else with a session of its own.
+    """
+
+    def __init__(self, factory, service):
+        super().__init__()
+        self._factory = factory
+        self._service = service
+
+    def request(self, method, url, *args, **kwargs):
+        return self._factory.get(self._service).request(method, url, *args, **kwargs)
+
+    def close(self):
+        """Leave the shared session open; the factory closes it when it is rebuilt."""
+
+
+class SessionFactory:
+    """
+    One keep-alive ``requests.Session`` per service, shared by every thread in the process.
+
+    Each session keeps a urllib3 pool per host, so repeated calls to a service reuse an
+    open connection instead of paying for a new TCP (and TLS) handshake. The callers are
+    blocking ones (Flask routes, scheduled jobs, Jellyfin syncs and Graph calls; the
+    pipeline's TMDb and Jackett lookups run on the async engine instead), so a pool
+    holds Http.pool_size connections, sized for concurrent web requests; beyond that,
+    extra connections are opened and closed per call rather than blocking. Sessions
+    are rebuilt when the Http section of config.yaml changes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sessions = {}
+        config_store.subscribe('Http', lambda config: self.reset())
+
+    def get(self, service):
+        """Return the shared session for ``service`` (e.g. 'tmdb', 'jackett', 'jellyfin', 'graph')."""
+        session = self._sessions.get(service)
+        if session is not None:
+            return session
+        with self._lock:
+            session = self._sessions.get(service)
+            if session is None:
+                session = self._sessions[service] = self._build(service)
+        return session
+
+    def proxy(self, service):
+        """Return a ServiceSession for ``service``, for clients that hold on to their session."""
+        return ServiceSession(self, service)
+
+    def _build(self, service):
+        settings = Config().sections['Http']
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=settings.hosts_per_service, pool_maxsize=settings.pool_size)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        logging.info(f"HTTP session for '{service}' created with {settings.pool_size} connections per host.")
+        return session
+
+    def stats(self):
+        """
+        Report connection reuse per service.
+
+        Returns:
+            dict: Service -> connections opened, requests sent and the share of requests
+            that reused an open connection.
+        """
+        stats = {}
+        for service, session in list(self._sessions.items()):
+            connections = requests_sent = 0
+            for adapter in {id(adapter): adapter for adapter in session.adapters.values()}.values():
+                pools = adapter.poolmanager.pools
+                for key in pools.keys():
+                    pool = pools.get(key)
+                    if pool is not None:
+                        connections += pool.num_connections
+                        requests_sent += pool.num_requests
+            stats[service] = {
+                'connections': connections,
+                'requests': requests_sent,
+                'reuse_ratio': round(1 - connections / requests_sent, 3) if requests_sent else None
+            }
+        return stats
+
+    def reset(self):
+        """Close every session; the next get() builds a new one."""
+        with self._lock:
+            sessions, self._sessions = self._sessions, {}
+        for session in sessions.values():
+            session.close()
+
+
+# Shared per-process sessions; helpers fetch theirs with sessions.get(service), or hand sessions.proxy(service) to clients
+sessions = SessionFactory()
@@ -1,8 +1,15 @@
+import asyncio
+import aiohttp
 import requests
 import re
 import logging
 import time
 from config import Config
+from app.helpers.async_engine import engine
+from app.helpers.http_sessions import sessions
+
+# Seconds a query that returned nothing is skipped before Jackett is searched again
+FAILED_SEARCH_TTL = 3600
 
 
 class JackettHelper:
@@ -37,59 +44,19 @@ class JackettHelper:
 
         # Format the query
         formatted_query = self.format_query(query, category)
-        if formatted_query in self.failed_search_cache:
-            logging.info(f"Skipping search for '{formatted_query}' (cached as failed).")
+        if self._recently_failed(formatted_query):
             return []
 
         max_retries = 3
         for attempt in range(max_retries):
             try:
-                # Build request URL and parameters
-                url = f"{self.server_url}/api/v2.0/indexers/all/results"
-                params = {
-                    'apikey': self.api_key,
-                    'Query': formatted_query,
-                    'Category[]': self.categories.get(category, 2000)  # Default to "Movies" category
-                }
+                url, params = self._search_request(formatted_query, category)
 
                 # Send the request to Jackett
                 logging.info(f"Sending request to Jackett: {url}")
-                response = requests.get(url, params=params, timeout=10)  # Add a timeout
+                response = sessions.get('jackett').get(url, params=params, timeout=10)  # Add a timeout
                 response.raise_for_status()
-
-                # Parse the response
-                data = response.json()
-                results = data.get('Results', [])
-                if not results:
-                    logging.warning(f"No results found for query: {formatted_query}.")
-                    self.failed_search_cache[formatted_query] = time.time()
-                    return []
-
-                # Filter and sort results by seeders and ensure valid magnet links
-                valid_results = [
-                    {
-                        'title': result.get('Title', 'Unknown Title'),
-                        'seeders': result.get('Seeders', 0),
-                        'magnet': result.get('MagnetUri')
-                    }
-                    for result in results
-                    if result.get('Seeders', 0) > 0 and result.get('MagnetUri')
-                ]
-                sorted_results = sorted(valid_results, key=lambda r: r['seeders'], reverse=True)
-
-                if not sorted_results:
-                    logging.warning(f"No suitable results with seeders found for query: {formatted_query}.")
-                    self.failed_search_cache[formatted_query] = time.time()
-                    return []
-
-                # Log the results
-                logging.info(f"Results found: {len(sorted_results)}")
-                for result in sorted_results:
-                    logging.info(
-                        f"Title: {result['title']} | Seeders: {result['seeders']} | Magnet: {result['magnet']}"
-                    )
-
-                return sorted_results
+                return self._parse_results(response.json(), formatted_query)
 
             except requests.RequestException as e:
                 logging.error(f"Request error on attempt {attempt + 1}/{max_retries} for query '{formatted_query}': {e}")
@@ -101,6 +68,86 @@ class JackettHelper:
         logging.error(f"All attempts to contact Jackett failed for query: {formatted_query}")
         return []
 
+    async def search_jackett_async(self, query, category="Movies"):
+        """
+        Async counterpart of search_jackett, run on the shared async engine.
+
+        An empty list means Jackett answered with nothing usable. Unlike search_jackett,
+        a Jackett that cannot be reached is an error rather than an empty result, so
+        the pipeline does not record an outage as a title without seeders.
+
+        Raises:
+            aiohttp.ClientError: If every attempt failed to connect or got a non-2xx response.
+            asyncio.TimeoutError: If every attempt timed out.
+        """
+        logging.info(f"Searching Jackett for: {query} in category: {category}")
+        formatted_query = self.format_query(query, category)
+        if self._recently_failed(formatted_query):
+            return []
+
+        max_retries = 3
+        for attempt in range(max_retries):
+            try:
+                url, params = self._search_request(formatted_query, category)
+                logging.info(f"Sending request to Jackett: {url}")
+                return self._parse_results(await engine.get_json(url, params=params, timeout=10), formatted_query)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logging.error(f"Request error on attempt {attempt + 1}/{max_retries} for query '{formatted_query}': {e}")
+                if attempt == max_retries - 1:
+                    logging.error(f"All attempts to contact Jackett failed for query: {formatted_query}")
+                    raise
+                await asyncio.sleep(2 ** attempt)
+
+    def _recently_failed(self, formatted_query):
+        failed_at = self.failed_search_cache.get(formatted_query)
+        if failed_at and time.time() - failed_at < FAILED_SEARCH_TTL:
+            logging.info(f"Skipping search for '{formatted_query}' (cached as failed).")
+            return True
+        return False
+
+    def _search_request(self, formatted_query, category):
+        """URL and parameters of a Jackett search across all indexers."""
+        url = f"{self.server_url}/api/v2.0/indexers/all/results"
+        params = {
+            'apikey': self.api_key,
+            'Query': formatted_query,
+            'Category[]': self.categories.get(category, 2000)  # Default to "Movies" category
+        }
+        return url, params
+
+    def _parse_results(self, data, formatted_query):
+        """Keep results with seeders and a magnet link, best seeded first; remember searches that found none."""
+        results = data.get('Results', [])
+        if not results:
+            logging.warning(f"No results found for query: {formatted_query}.")
+            self.failed_search_cache[formatted_query] = time.time()
+            return []
+
+        # Filter and sort results by seeders and ensure valid magnet links
+        valid_results = [
+            {
+                'title': result.get('Title', 'Unknown Title'),
+                'seeders': result.get('Seeders', 0),
+                'magnet': result.get('MagnetUri')
+            }
+            for result in results
+            if result.get('Seeders', 0) > 0 and result.get('MagnetUri')
+        ]
+        sorted_results = sorted(valid_results, key=lambda r: r['seeders'], reverse=True)
+
+        if not sorted_results:
+            logging.warning(f"No suitable results with seeders found for query: {formatted_query}.")
+            self.failed_search_cache[formatted_query] = time.time()
+            return []
+
+        # Log the results
+        logging.info(f"Results found: {len(sorted_results)}")
+        for result in sorted_results:
+            logging.info(
+                f"Title: {result['title']} | Seeders: {result['seeders']} | Magnet: {result['magnet']}"
+            )
+
+        return sorted_results
 
     @staticmethod
     def format_query(query, category):
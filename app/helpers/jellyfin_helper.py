@@ -1,88 +1,356 @@
 import requests
 import logging
+import uuid
 from config import Config
-from app.models import db, Media
+from app.helpers.http_sessions import sessions
+from app.models import db, Media, Request, SyncState
+from app.helpers.library_index import library_index, normalize_title, split_year
 from datetime import datetime
+from itertools import islice
+from sqlalchemy import update, select, tuple_, or_
 
 logging.basicConfig(level=logging.INFO)
 
+# Jellyfin item types that are synced into the Media table, mapped to our media types
+LIBRARY_ITEM_TYPES = {
+    'Movie': 'Movie',
+    'Series': 'TV Show',
+}
+
+# Only request the fields we store (Name, Id, Type and ProductionYear are always returned)
+LIBRARY_FIELDS = 'Overview,Path,DateLastSaved'
+
+# Music is synced at artist and album level; individual Audio tracks are not stored
+MUSIC_ITEM_TYPES = {
+    'MusicArtist': 'Music',
+    'MusicAlbum': 'Music',
+}
+MUSIC_FIELDS = 'Overview,Path,DateLastSaved'
+
+SYNCED_ITEM_TYPES = {**LIBRARY_ITEM_TYPES, **MUSIC_ITEM_TYPES}
+
+# Jellyfin webhook plugin notification types applied to the library
+WEBHOOK_EVENTS = ('ItemAdded', 'ItemUpdated', 'ItemDeleted')
+
+# Request statuses that are closed once the requested title shows up in the library
+OPEN_REQUEST_STATUSES = ('Pending', 'Waiting', 'In Progress')
+
+# SyncState rows holding the DateLastSaved watermark of the last successful sync
+LIBRARY_SYNC_STATE = 'jellyfin_library'
+MUSIC_SYNC_STATE = 'jellyfin_music'
+
+
+def batched(iterable, size):
+    """Yield lists of up to ``size`` items from ``iterable`` without materializing it."""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
 class JellyfinHelper:
-    def __init__(self):
+    def __init__(self, page_size=500):
         config = Config()
         self.server_url = config.JELLYFIN_SERVER_URL
         self.api_key = config.JELLYFIN_API_KEY
+        self.webhook_secret = config.JELLYFIN_WEBHOOK_SECRET
+        self.page_size = page_size
 
         if not self.server_url or not self.api_key:
             raise ValueError("Jellyfin configuration is missing 'server_url' or 'api_key'.")
 
-    def get_media_items(self, media_type='Movie'):
-        """Fetch all media items of a specific type from Jellyfin."""
+    def iter_media_items(self, media_types=tuple(LIBRARY_ITEM_TYPES), fields=LIBRARY_FIELDS, min_date_last_saved=None):
+        """
+        Yield pages of Jellyfin items using StartIndex/Limit paging.
+
+        Args:
+            media_types (iterable): Jellyfin item types to include (e.g., "Movie", "Series").
+            fields (str): Comma-separated list of extra fields to request.
+            min_date_last_saved (str): Only return items saved at or after this ISO timestamp.
+
+        Yields:
+            list: One page of item dictionaries, at most ``page_size`` long.
+
+        Raises:
+            requests.exceptions.RequestException: If a page cannot be fetched.
+        """
+        url, headers, params = self._items_request(media_types, fields, min_date_last_saved)
+
+        while True:
+            response = sessions.get('jellyfin').get(url, headers=headers, params=params, timeout=30)
+            response.raise_for_status()
+            data = response.json()
+            items = data.get('Items', [])
+            if items:
+                yield items
+
+            params["StartIndex"] += len(items)
+            if len(items) < self.page_size or params["StartIndex"] >= data.get('TotalRecordCount', 0):
+                break
+
+    def _items_request(self, media_types, fields, min_date_last_saved=None):
+        """URL, headers and first-page parameters of an /Items query."""
         url = f"{self.server_url}/Items"
         headers = {
             "X-Emby-Token": self.api_key
         }
         params = {
-            "IncludeItemTypes": media_type,
-            "Recursive": "true"
+            "IncludeItemTypes": ",".join(media_types),
+            "Recursive": "true",
+            "Fields": fields,
+            "EnableImages": "false",
+            "EnableUserData": "false",
+            "SortBy": "DateCreated,SortName",
+            "SortOrder": "Ascending",
+            "Limit": self.page_size,
+            "StartIndex": 0
         }
+        if min_date_last_saved:
+            params["MinDateLastSaved"] = min_date_last_saved
+
+        return url, headers, params
+
+    def get_media_items(self, media_type='Movie'):
+        """Fetch all media items of a specific type from Jellyfin."""
         try:
-            response = requests.get(url, headers=headers, params=params)
-            response.raise_for_status()
-            items = response.json().get('Items', [])
+            items = [item for page in self.iter_media_items(media_types=(media_type,)) for item in page]
             logging.info(f"Fetched {len(items)} {media_type.lower()} items from Jellyfin.")
             return items
         except requests.exceptions.RequestException as e:
             logging.error(f"Failed to fetch {media_type.lower()} items from Jellyfin: {e}")
             return []
 
-    def save_items_to_db(self):
-        """Fetch movies and TV shows from Jellyfin and save them to the MySQL database."""
-        movie_items = self.get_media_items(media_type='Movie')
-        show_items = self.get_media_items(media_type='Series')
+    def item_exists(self, title, media_type=None):
+        """Check whether a title is in the synced library, without a Jellyfin round trip."""
+        return library_index.contains(title, media_type)
 
-        all_items = movie_items + show_items
-        if not all_items:
-            logging.info("No items to save to the database.")
-            return
+    def find_items(self, title, media_type=None):
+        """Return synced library rows whose normalized title matches ``title``."""
+        matches = library_index.find(title, media_type)
+        if not matches:
+            return []
+        return Media.query.filter(Media.id.in_([entry['id'] for entry in matches])).all()
 
-        # Clear the Media table to avoid duplicates (or use your preferred duplicate handling method)
-        db.session.query(Media).delete()
-        db.session.commit()
-
-        new_media_count = 0
-
-        for item in all_items:
-            title = item.get('Name')
-            media_type = item.get('Type')
-            release_date = item.get('ProductionYear')
-            path = item.get('Path', '')
-            description = item.get('Overview', '')
-
-            # Convert Jellyfin's type to custom media type
-            if media_type == 'Movie':
-                media_type = 'Movie'
-            elif media_type == 'Series':
-                media_type = 'TV Show'
-
-            # Check if the item already exists in the database
-            existing_media = Media.query.filter_by(title=title, media_type=media_type).first()
-            if not existing_media:
-                try:
-                    new_media = Media(
-                        title=title,
-                        media_type=media_type,
-                        release_date=datetime.strptime(str(release_date), '%Y') if release_date else None,
-                        path=path,
-                        description=description
+    @staticmethod
+    def _item_to_row(item, item_types=None):
+        """Convert a Jellyfin item into Media column values, or None if the item is not synced."""
+        media_type = (item_types or SYNCED_ITEM_TYPES).get(item.get('Type'))
+        if not media_type or not item.get('Id') or not item.get('Name'):
+            return None
+
+        release_date = None
+        if item.get('ProductionYear'):
+            try:
+                release_date = datetime.strptime(str(item['ProductionYear']), '%Y').date()
+            except ValueError as date_error:
+                logging.error(f"Error parsing release date for {item.get('Name')}: {date_error}")
+
+        return {
+            'jellyfin_id': item['Id'],
+            'title': item['Name'],
+            'media_type': media_type,
+            'release_date': release_date,
+            'path': item.get('Path', ''),
+            'description': item.get('Overview', ''),
+            'status': 'Available'
+        }
+
+    def save_items_to_db(self, full=False):
+        """
+        Sync movies and TV shows from Jellyfin into the Media table.
+
+        Only items saved since the last successful sync are requested, unless ``full``
+        is set or no watermark exists yet. Rows are upserted by Jellyfin item ID, and a
+        full sync marks rows whose item no longer exists in Jellyfin as 'Unavailable'.
+
+        Returns:
+            dict: Counts of inserted, updated, unchanged and removed items.
+        """
+        return self._sync_items(LIBRARY_ITEM_TYPES, LIBRARY_FIELDS, LIBRARY_SYNC_STATE, full)
+
+    def save_music_to_db(self, full=False):
+        """
+        Sync music artists and albums from Jellyfin into the Media table.
+
+        Items are streamed page by page and written in batches, so memory use is bounded
+        by the page size rather than the size of the music library.
+
+        Returns:
+            dict: Counts of inserted, updated, unchanged and removed items.
+        """
+        return self._sync_items(MUSIC_ITEM_TYPES, MUSIC_FIELDS, MUSIC_SYNC_STATE, full)
+
+    def _sync_items(self, item_types, fields, state_name, full=False):
+        """Stream Jellyfin items of ``item_types`` into Media in batches and advance the sync watermark."""
+        state = db.session.get(SyncState, state_name) or SyncState(name=state_name)
+        min_date_last_saved = None if full else state.cursor
+        # A full sync stamps every returned item with its token, so missing items can be found in SQL
+        sync_token = uuid.uuid4().hex if min_date_last_saved is None else None
+        progress = {'watermark': state.cursor}
+        counts = {'inserted': 0, 'updated': 0, 'unchanged': 0, 'removed': 0}
+
+        try:
+            items = self._iter_tracked_items(item_types, fields, min_date_last_saved, progress)
+            rows = (row for row in (self._item_to_row(item, item_types) for item in items) if row)
+
+            for batch in batched(rows, self.page_size):
+                self._adopt_legacy_rows(batch)
+                result = Media.bulk_upsert(batch, keys=('jellyfin_id',), batch_size=self.page_size)
+                if sync_token:
+                    db.session.execute(
+                        update(Media).where(Media.jellyfin_id.in_([row['jellyfin_id'] for row in batch]))
+                        .values(last_seen_sync=sync_token).execution_options(synchronize_session=False)
                     )
-                    db.session.add(new_media)
-                    new_media_count += 1
-                except ValueError as date_error:
-                    logging.error(f"Error parsing release date for {title}: {date_error}")
+                db.session.commit()
+                counts['inserted'] += result.inserted
+                counts['updated'] += result.updated
+                counts['unchanged'] += result.unchanged
+
+            if sync_token:
+                counts['removed'] = self._mark_missing_unavailable(sync_token, item_types.values())
+
+            state.cursor = progress['watermark']
+            state.last_synced_at = datetime.now()
+            db.session.add(state)
+            if counts['inserted'] or counts['updated'] or counts['removed']:
+                library_index.mark_changed()
+            db.session.commit()
+            library_index.refresh()
+            logging.info(
+                f"Jellyfin {state_name} sync ({'full' if min_date_last_saved is None else 'incremental'}) finished: "
+                f"{counts['inserted']} inserted, {counts['updated']} updated, "
+                f"{counts['unchanged']} unchanged, {counts['removed']} removed."
+            )
+            return counts
+        except Exception as e:
+            db.session.rollback()
+            logging.error(f"Failed to sync Jellyfin items to the database: {e}")
+            raise
+
+    def _iter_tracked_items(self, item_types, fields, min_date_last_saved, progress):
+        """Yield items one by one while recording the newest DateLastSaved."""
+        for page in self.iter_media_items(media_types=tuple(item_types), fields=fields, min_date_last_saved=min_date_last_saved):
+            for item in page:
+                saved = item.get('DateLastSaved')
+                if saved and (not progress['watermark'] or saved > progress['watermark']):
+                    progress['watermark'] = saved
+                yield item
+
+    def apply_webhook_event(self, payload):
+        """
+        Apply a single Jellyfin webhook plugin notification to the library.
+
+        Added and updated items are upserted into Media and the library index, and open
+        requests for the same title are marked 'Completed'. Deleted items are marked
+        'Unavailable' and dropped from the index.
+
+        Args:
+            payload (dict): Notification with NotificationType, ItemId, ItemType, Name and
+                optionally Year, Overview and Path.
+
+        Returns:
+            dict: The event, the action taken and the number of closed requests.
+        """
+        event = payload.get('NotificationType')
+        item = {
+            'Id': payload.get('ItemId'),
+            'Name': payload.get('Name'),
+            'Type': payload.get('ItemType'),
+            'ProductionYear': payload.get('Year'),
+            'Overview': payload.get('Overview'),
+            'Path': payload.get('Path')
+        }
+        result = {'event': event, 'item_id': item['Id'], 'action': 'ignored', 'closed_requests': 0}
+        if event not in WEBHOOK_EVENTS or item['Type'] not in SYNCED_ITEM_TYPES or not item['Id']:
+            return result
 
         try:
+            if event == 'ItemDeleted':
+                media = Media.query.filter_by(jellyfin_id=item['Id']).first()
+                if media:
+                    media.status = 'Unavailable'
+                    library_index.mark_changed()
+                    db.session.commit()
+                    library_index.discard(media.id)
+                    result['action'] = 'removed'
+                return result
+
+            row = self._item_to_row(item)
+            if row is None:
+                return result
+            # Webhook templates may omit fields; keep what the last sync stored for those
+            row = {column: value for column, value in row.items() if value is not None}
+            Media.bulk_upsert([row], keys=('jellyfin_id',))
+            result['closed_requests'] = self._close_matching_requests(row['title'], row['media_type'])
+            library_index.mark_changed()
             db.session.commit()
-            logging.info(f"Added {new_media_count} new items to the database.")
+
+            library_index.add(Media.query.filter_by(jellyfin_id=item['Id']).first())
+            result['action'] = 'upserted'
+            logging.info(f"Applied Jellyfin {event} for '{row['title']}' ({result['closed_requests']} requests closed).")
+            return result
         except Exception as e:
             db.session.rollback()
-            logging.error(f"Failed to commit items to the database: {e}")
+            logging.error(f"Failed to apply Jellyfin {event} for item {item['Id']}: {e}")
+            raise
+
+    @staticmethod
+    def _close_matching_requests(title, media_type):
+        """Mark open requests for a title that just arrived in the library as 'Completed'."""
+        key = normalize_title(title)
+        open_requests = Request.query.filter(
+            Request.media_type == media_type,
+            Request.status.in_(OPEN_REQUEST_STATUSES)
+        )
+        closed = 0
+        for req in open_requests:
+            if key in (normalize_title(req.title), normalize_title(split_year(req.title)[0])):
+                req.status = 'Completed'
+                closed += 1
+        return closed
+
+    @staticmethod
+    def _adopt_legacy_rows(batch):
+        """
+        Give library rows stored without a Jellyfin ID (by the old delete-and-reinsert sync) the ID of the batch item with their title.
+
+        IDs already on a row (e.g. one inserted by the webhook) are not adopted, as a
+        second row with the same ID would violate the unique jellyfin_id index.
+        """
+        keys = {(row['title'], row['media_type']): row['jellyfin_id'] for row in batch}
+        taken = set(db.session.execute(
+            select(Media.jellyfin_id).where(Media.jellyfin_id.in_(list(keys.values())))
+        ).scalars())
+        keys = {key: jellyfin_id for key, jellyfin_id in keys.items() if jellyfin_id not in taken}
+        if not keys:
+            return
+        legacy = db.session.execute(
+            select(Media.id, Media.title, Media.media_type).where(
+                Media.jellyfin_id.is_(None), tuple_(Media.title, Media.media_type).in_(list(keys))
+            )
+        )
+        adopted = [
+            {'id': media_id, 'jellyfin_id': keys.pop((title, media_type))}
+            for media_id, title, media_type in legacy if (title, media_type) in keys
+        ]
+        if adopted:
+            db.session.execute(update(Media), adopted)
+
+    @staticmethod
+    def _mark_missing_unavailable(sync_token, media_types):
+        """
+        Soft-delete available library rows whose Jellyfin item was not returned by the full sync ``sync_token``.
+
+        Rows without a Jellyfin ID are included: a legacy row still missing one after the
+        sync adopted IDs by title has no matching item in Jellyfin.
+        """
+        result = db.session.execute(
+            update(Media).where(
+                Media.media_type.in_(set(media_types)),
+                Media.status == 'Available',
+                or_(Media.last_seen_sync.is_(None), Media.last_seen_sync != sync_token)
+            ).values(status='Unavailable').execution_options(synchronize_session=False)
+        )
+        return result.rowcount
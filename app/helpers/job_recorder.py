@@ -0,0 +1,138 @@
+import logging
+import math
+import os
+import socket
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from app.models import db, JobRun
+
+logging.basicConfig(level=logging.INFO)
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+class JobRecorder:
+    """
+    Collects timings and counts for one run of a scheduled job and saves them as a JobRun.
+
+    Stage timings may be added from several threads (e.g. pipeline workers).
+    """
+
+    def __init__(self, job_name):
+        self.job_name = job_name
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self.started_at = datetime.utcnow()
+        self.items = 0
+        self.counts = Counter()
+        self.stage_seconds = Counter()
+        self._started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        """Time the enclosed block and add it to stage ``name``."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_stage_seconds({name: time.perf_counter() - started})
+
+    def add_stage_seconds(self, stage_seconds):
+        with self._lock:
+            self.stage_seconds.update(stage_seconds)
+
+    def add_counts(self, counts, items=None):
+        """Add outcome counts; ``items`` defaults to their total."""
+        with self._lock:
+            self.counts.update(counts)
+            self.items += sum(counts.values()) if items is None else items
+
+    def add_pipeline_report(self, report):
+        """Add the counts and stage timings of a request pipeline run."""
+        self.add_counts(report.counts, len(report.items))
+        self.add_stage_seconds(report.stage_seconds)
+
+    def save(self, error=None):
+        """Write the run to job_runs in its own transaction. Failures are logged, never raised."""
+        duration = time.perf_counter() - self._started
+        run = JobRun(
+            job_name=self.job_name,
+            owner=self.owner,
+            started_at=self.started_at,
+            finished_at=datetime.utcnow(),
+            duration_seconds=round(duration, 3),
+            status='Failed' if error else 'Success',
+            items=self.items,
+            counts=dict(self.counts),
+            stage_seconds={name: round(seconds, 3) for name, seconds in self.stage_seconds.items()},
+            error=str(error)[:255] if error else None
+        )
+        try:
+            db.session.rollback()  # Don't commit anything the job left half done
+            db.session.add(run)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logging.error(f"Error saving run of {self.job_name}: {e}")
+        logging.info(f"{self.job_name} {run.status.lower()} in {run.duration_seconds}s: {run.items} items, {run.stage_seconds}")
+        return run
+
+
+@contextmanager
+def record_job(job_name):
+    """
+    Record the enclosed block as a run of ``job_name``.
+
+    Yields the JobRecorder; the run is saved when the block exits, as Failed if it
+    raised (the exception is re-raised).
+    """
+    recorder = JobRecorder(job_name)
+    try:
+        yield recorder
+    except Exception as e:
+        recorder.save(error=e)
+        raise
+    recorder.save()
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of ``values``; None if there are none."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def summarize_runs(runs):
+    """
+    Summarize runs of one job, most recent first.
+
+    Returns:
+        dict: Run count, failures, overlapping runs, duration percentiles and per-stage percentiles.
+    """
+    durations = [run.duration_seconds for run in runs if run.duration_seconds is not None]
+    stages = {}
+    for run in runs:
+        for stage, seconds in (run.stage_seconds or {}).items():
+            stages.setdefault(stage, []).append(seconds)
+
+    # A run overlaps when it started before the previous run (in time) had finished
+    overlaps = 0
+    chronological = sorted(runs, key=lambda run: run.started_at)
+    for previous, run in zip(chronological, chronological[1:]):
+        if previous.finished_at and run.started_at < previous.finished_at:
+            overlaps += 1
+
+    return {
+        'runs': len(runs),
+        'failed': sum(1 for run in runs if run.status == 'Failed'),
+        'overlapping': overlaps,
+        'duration_seconds': {f"p{pct}": percentile(durations, pct) for pct in PERCENTILES} | {'max': max(durations, default=None)},
+        'stage_seconds': {
+            stage: {f"p{pct}": percentile(values, pct) for pct in PERCENTILES}
+            for stage, values in stages.items()
+        }
+    }
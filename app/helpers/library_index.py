@@ -0,0 +1,273 @@
+import logging
+import re
+import threading
+import time
+import unicodedata
+import uuid
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy import select, update
+from app.models import db, Media, SyncState
+
+logging.basicConfig(level=logging.INFO)
+
+LEADING_ARTICLES = ('the', 'a', 'an')
+TRAILING_YEAR = re.compile(r'\s*[\(\[]?((?:18|19|20)\d{2})[\)\]]?\s*$')
+NON_WORD = re.compile(r'[\W_]+')
+
+# SyncState row whose cursor changes whenever Media rows change, in any process
+LIBRARY_VERSION_STATE = 'library_index'
+# Seconds between checks of the library version; bounds how stale another process's index can be
+VERSION_CHECK_INTERVAL = 30
+
+
+def split_year(title):
+    """Split a trailing release year off a title, e.g. 'Dune (2021)' -> ('Dune', 2021)."""
+    match = TRAILING_YEAR.search(title)
+    if match and match.start() > 0:
+        return title[:match.start()], int(match.group(1))
+    return title, None
+
+
+def normalize_title(title):
+    """
+    Fold a title into a lookup key.
+
+    Diacritics and punctuation are removed, '&' becomes 'and', case is folded and a
+    leading article is dropped, so 'The Amélie!' and 'amelie' share a key.
+    """
+    folded = unicodedata.normalize('NFKD', title or '')
+    folded = ''.join(char for char in folded if not unicodedata.combining(char)).casefold()
+    words = NON_WORD.sub(' ', folded.replace('&', ' and ')).split()
+    if len(words) > 1 and words[0] in LEADING_ARTICLES:
+        words = words[1:]
+    return ' '.join(words)
+
+
+def trigrams(key):
+    """Return the set of padded character trigrams for a normalized key."""
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class LibraryIndex:
+    """
+    In-memory index of available Media rows for title lookups.
+
+    Exact lookups are dictionary hits on normalized keys (optionally with the release
+    year), and fuzzy lookups use an inverted trigram index. Rebuilds swap in complete
+    new maps, so readers never see a partially built index.
+
+    Each process (web workers, worker.py) holds its own copy. Writers record a new
+    library version with mark_changed(), and readers compare it with the version their
+    copy was built from at most every ``check_interval`` seconds, rebuilding when it moved.
+    """
+
+    def __init__(self, check_interval=VERSION_CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._version = None
+        self._checked_at = 0.0
+        self._by_key = {}
+        self._by_key_year = {}
+        self._trigram_keys = {}
+        self._key_trigrams = {}
+        self._keys_by_id = {}
+
+    @staticmethod
+    def _entry(media_id, title, media_type, release_date, jellyfin_id):
+        return {
+            'id': media_id,
+            'title': title,
+            'media_type': media_type,
+            'year': release_date.year if release_date else None,
+            'jellyfin_id': jellyfin_id
+        }
+
+    @staticmethod
+    def _current_version():
+        return db.session.execute(
+            select(SyncState.cursor).where(SyncState.name == LIBRARY_VERSION_STATE)
+        ).scalar()
+
+    def mark_changed(self):
+        """
+        Record a new library version in the current transaction, so other processes rebuild their index.
+
+        Call it in the transaction that changes Media rows, then apply the change to this
+        process's index (add(), discard() or refresh()) once it is committed. The version
+        is bumped with a compare-and-set against the version this copy was built from:
+        if another process changed the library in the meantime, this copy is rebuilt on
+        next use instead of adopting the new version.
+        """
+        version = uuid.uuid4().hex
+        now = datetime.now()
+        if self._loaded:
+            # The row lock taken by the UPDATE makes a concurrent bump from the same version match nothing
+            swapped = db.session.execute(
+                update(SyncState)
+                .where(SyncState.name == LIBRARY_VERSION_STATE, SyncState.cursor == self._version)
+                .values(cursor=version, last_synced_at=now)
+            ).rowcount
+            if swapped:
+                self._version = version
+                return
+
+        state = db.session.get(SyncState, LIBRARY_VERSION_STATE) or SyncState(name=LIBRARY_VERSION_STATE)
+        state.cursor = version
+        state.last_synced_at = now
+        db.session.add(state)
+        with self._lock:
+            # Another process changed the library since this copy was built: rebuild on next use
+            self._version = None
+            self._checked_at = 0.0
+
+    def refresh(self):
+        """Rebuild the index from available Media rows."""
+        version = self._current_version()
+        by_key = defaultdict(list)
+        by_key_year = defaultdict(list)
+        trigram_keys = defaultdict(set)
+        key_trigrams = {}
+        keys_by_id = {}
+
+        rows = db.session.query(
+            Media.id, Media.title, Media.media_type, Media.release_date, Media.jellyfin_id
+        ).filter(Media.status == 'Available')
+        count = 0
+        for row in rows:
+            entry = self._entry(*row)
+            key = normalize_title(entry['title'])
+            if not key:
+                continue
+            by_key[key].append(entry)
+            by_key_year[(key, entry['year'])].append(entry)
+            keys_by_id[entry['id']] = (key, entry['year'])
+            if key not in key_trigrams:
+                key_trigrams[key] = trigrams(key)
+                for gram in key_trigrams[key]:
+                    trigram_keys[gram].add(key)
+            count += 1
+
+        with self._lock:
+            self._by_key = dict(by_key)
+            self._by_key_year = dict(by_key_year)
+            self._trigram_keys = dict(trigram_keys)
+            self._key_trigrams = key_trigrams
+            self._keys_by_id = keys_by_id
+            self._version = version
+            self._checked_at = time.monotonic()
+            self._loaded = True
+        logging.info(f"Library index rebuilt with {count} items ({len(key_trigrams)} distinct titles).")
+
+    def add(self, media):
+        """Add or replace a single Media row, e.g. after a webhook event."""
+        if not self._loaded:
+            return
+        entry = self._entry(media.id, media.title, media.media_type, media.release_date, media.jellyfin_id)
+        key = normalize_title(entry['title'])
+        with self._lock:
+            self._discard_locked(entry['id'])
+            if not key:
+                return
+            # Lists are replaced rather than mutated so concurrent readers keep a consistent view
+            self._by_key[key] = self._by_key.get(key, []) + [entry]
+            self._by_key_year[(key, entry['year'])] = self._by_key_year.get((key, entry['year']), []) + [entry]
+            self._keys_by_id[entry['id']] = (key, entry['year'])
+            if key not in self._key_trigrams:
+                self._key_trigrams[key] = trigrams(key)
+                for gram in self._key_trigrams[key]:
+                    self._trigram_keys.setdefault(gram, set()).add(key)
+
+    def discard(self, media_id):
+        """Remove a single Media row from the index."""
+        with self._lock:
+            self._discard_locked(media_id)
+
+    def _discard_locked(self, media_id):
+        key, year = self._keys_by_id.pop(media_id, (None, None))
+        if key is None:
+            return
+        kept = [entry for entry in self._by_key_year.get((key, year), []) if entry['id'] != media_id]
+        if kept:
+            self._by_key_year[(key, year)] = kept
+        else:
+            self._by_key_year.pop((key, year), None)
+        remaining = [entry for entry in self._by_key.get(key, []) if entry['id'] != media_id]
+        if remaining:
+            self._by_key[key] = remaining
+            return
+        self._by_key.pop(key, None)
+        for gram in self._key_trigrams.pop(key, ()):
+            self._trigram_keys.get(gram, set()).discard(key)
+
+    def ensure_loaded(self):
+        """Build the index on first use, and rebuild it when another process changed the library."""
+        if not self._loaded:
+            self.refresh()
+            return
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        if self._current_version() != self._version:
+            logging.info("Library changed in another process; rebuilding the library index.")
+            self.refresh()
+
+    def find(self, title, media_type=None):
+        """
+        Return library entries whose normalized title matches ``title``.
+
+        A trailing year in ``title`` (e.g. 'Dune (2021)') restricts the match to that year;
+        if nothing matches, the whole string is tried as a title (e.g. 'Blade Runner 2049').
+        """
+        self.ensure_loaded()
+        bare_title, year = split_year(title or '')
+        matches = self._by_key_year.get((normalize_title(bare_title), year), []) if year else []
+        if not matches:
+            matches = self._by_key.get(normalize_title(title), [])
+        if media_type:
+            matches = [entry for entry in matches if entry['media_type'] == media_type]
+        return list(matches)
+
+    def contains(self, title, media_type=None):
+        """Check whether ``title`` is in the library."""
+        return bool(self.find(title, media_type))
+
+    def fuzzy(self, title, limit=5, min_score=0.4):
+        """
+        Return up to ``limit`` entries whose titles are similar to ``title``.
+
+        Similarity is the Jaccard index of the title trigram sets.
+
+        Returns:
+            list: (score, entry) tuples ordered by descending score.
+        """
+        self.ensure_loaded()
+        query_grams = trigrams(normalize_title(title))
+        trigram_keys, key_trigrams, by_key = self._trigram_keys, self._key_trigrams, self._by_key
+
+        shared = defaultdict(int)
+        for gram in query_grams:
+            for key in tuple(trigram_keys.get(gram, ())):
+                shared[key] += 1
+
+        scored = []
+        for key, overlap in shared.items():
+            key_grams = key_trigrams.get(key)
+            if not key_grams:
+                continue
+            score = overlap / (len(query_grams) + len(key_grams) - overlap)
+            if score >= min_score:
+                scored.append((score, key))
+        scored.sort(reverse=True)
+
+        results = []
+        for score, key in scored[:limit]:
+            results.extend((round(score, 3), entry) for entry in by_key.get(key, []))
+        return results[:limit]
+
+
+# Shared per-process index, rebuilt after every Jellyfin sync and when the library version moves
+library_index = LibraryIndex()
@@ -1,211 +1,596 @@
 import os
+import re
+import html
+import tempfile
+import threading
+import time
 import requests
-import json
-from bs4 import BeautifulSoup
+from concurrent.futures import ProcessPoolExecutor
 from msal import PublicClientApplication, SerializableTokenCache
 import logging
 from app import db
-from app.models import Request
-from datetime import datetime
-from config import Config
+from app.models import Request, SyncState, ProcessedMessage
+from app.helpers.http_sessions import sessions
+from datetime import datetime, timedelta
+from sqlalchemy import insert, tuple_
+from config import Config, config_store
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 
-# Load configuration using Config class
-config = Config()
+GRAPH_BASE_URL = "https://graph.microsoft.com/v1.0"
 
-# Microsoft Graph API Configuration
-CLIENT_ID = config.OUTLOOK_CLIENT_ID
-TENANT_ID = config.OUTLOOK_TENANT_ID
-CACHE_FILE_PATH = config.OUTLOOK_CACHE_FILE_PATH
-SCOPES = config.OUTLOOK_SCOPES
+# Subjects that identify request emails (matched case-insensitively)
+REQUEST_SUBJECTS = ('tv show request', 'movie request', 'music request')
 
-AUTHORITY = f"https://login.microsoftonline.com/{TENANT_ID}"
+# Total body size above which titles are extracted in a process pool (when extract workers are configured)
+PARALLEL_EXTRACT_MIN_CHARS = 1_000_000
 
-class OutlookHelper:
-    def __init__(self):
+HTML_NON_TEXT = re.compile(r'<!--.*?-->|<(script|style|head)\b[^>]*>.*?</\1\s*>', re.IGNORECASE | re.DOTALL)
+HTML_TAG = re.compile(r'<[^>]*>')
+WHITESPACE = re.compile(r'\s+')
+
+
+def extract_text(body):
+    """Turn an email body (HTML or plain text) into a single line of text."""
+    text = HTML_TAG.sub(' ', HTML_NON_TEXT.sub(' ', body or ''))
+    return WHITESPACE.sub(' ', html.unescape(text)).strip()
+
+
+def extract_titles(bodies, workers=0):
+    """Extract text from many bodies, using a process pool for large batches if workers are configured."""
+    if workers and sum(len(body) for body in bodies) >= PARALLEL_EXTRACT_MIN_CHARS:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(extract_text, bodies, chunksize=max(1, len(bodies) // (workers * 4))))
+    return [extract_text(body) for body in bodies]
+
+
+def request_category(subject):
+    """Map a request email subject to a media type, or None if it is not a request."""
+    subject = (subject or '').lower()
+    if "tv show request" in subject:
+        return 'TV Show'
+    if "movie request" in subject:
+        return 'Movie'
+    if "music request" in subject:
+        return 'Music'
+    return None
+
+# SyncState row holding the @odata.deltaLink of the last completed inbox delta round
+INBOX_DELTA_STATE = 'outlook_inbox_delta'
+
+
+class GraphBatch:
+    """
+    Queue Microsoft Graph requests and send them through /$batch.
+
+    Requests are queued in groups that run in order (each request dependsOn the previous
+    one). Groups are never split across batch calls, so a batch holds whole groups and at
+    most MAX_REQUESTS requests. Requests that are throttled (429), fail on the server (5xx)
+    or whose batch call fails are resent, together with the rest of their group, after the
+    Retry-After delay Graph asks for.
+    """
+    MAX_REQUESTS = 20
+    MAX_ATTEMPTS = 3
+    # Upper bound in seconds on a single Retry-After wait, so a polling job is never parked for long
+    MAX_RETRY_AFTER = 30
+
+    def __init__(self, access_token):
+        self.access_token = access_token
+        self._groups = []
+        self._next_id = 1
+
+    def add_group(self, operations):
+        """
+        Queue requests that must run one after another.
+
+        Args:
+            operations (list): Dictionaries with 'method', 'url' (relative to the Graph version
+                root, e.g. '/me/messages/{id}'), optional 'body', 'expected' status codes and
+                'description' used in log messages.
+        """
+        if not operations:
+            return
+        if len(operations) > self.MAX_REQUESTS:
+            raise ValueError(f"A Graph batch group cannot hold more than {self.MAX_REQUESTS} requests.")
+
+        group = []
+        for operation in operations:
+            request = {
+                "id": str(self._next_id),
+                "method": operation['method'],
+                "url": operation['url']
+            }
+            if operation.get('body') is not None:
+                request["body"] = operation['body']
+                request["headers"] = {"Content-Type": "application/json"}
+            if group:
+                request["dependsOn"] = [group[-1][0]["id"]]
+            group.append((request, operation))
+            self._next_id += 1
+        self._groups.append(group)
+
+    def flush(self):
+        """
+        Send all queued requests, 20 per /$batch call.
+
+        Returns:
+            dict: Final status code for each queued request ID (the /$batch call's own status,
+            or None if it could not be sent, when the batch call failed).
+        """
+        statuses = {}
+        groups = []
+        for group in self._groups:
+            if sum(len(queued) for queued in groups) + len(group) > self.MAX_REQUESTS:
+                statuses.update(self._send_with_retries(groups))
+                groups = []
+            groups.append(group)
+        if groups:
+            statuses.update(self._send_with_retries(groups))
+        self._groups = []
+        return statuses
+
+    @staticmethod
+    def _retryable(status):
+        return status is None or status == 429 or status >= 500
+
+    def _send_with_retries(self, groups):
+        """Send ``groups`` in one /$batch call, resending each group from its first retryable failure."""
+        statuses = {}
+        for attempt in range(1, self.MAX_ATTEMPTS + 1):
+            results, retry_after = self._send([request for group in groups for request in group])
+            statuses.update(results)
+            retry = []
+            for group in groups:
+                failed_at = next(
+                    (index for index, (request, _) in enumerate(group) if self._retryable(results.get(request["id"]))),
+                    None
+                )
+                if failed_at is not None:
+                    # Earlier steps succeeded, so the first resent request no longer depends on anything
+                    first, operation = group[failed_at]
+                    first = {key: value for key, value in first.items() if key != "dependsOn"}
+                    retry.append([(first, operation)] + group[failed_at + 1:])
+            if not retry or attempt == self.MAX_ATTEMPTS:
+                break
+            delay = min(retry_after if retry_after is not None else 2 ** attempt, self.MAX_RETRY_AFTER)
+            logging.warning(
+                f"Graph batch: retrying {sum(len(group) for group in retry)} requests in {delay}s "
+                f"(attempt {attempt + 1} of {self.MAX_ATTEMPTS})."
+            )
+            time.sleep(delay)
+            groups = retry
+        return statuses
+
+    @staticmethod
+    def _retry_after(headers):
+        """Seconds from a Retry-After header, or None if there is none."""
+        value = (headers or {}).get('Retry-After')
+        try:
+            return max(0, int(value)) if value is not None else None
+        except (TypeError, ValueError):
+            return None
+
+    def _send(self, batch):
+        """
+        POST one /$batch payload and log every request that did not succeed.
+
+        Returns:
+            tuple: (statuses, retry_after); the longest Retry-After in seconds Graph sent, or None.
+        """
+        headers = {
+            "Authorization": f"Bearer {self.access_token}",
+            "Content-Type": "application/json"
+        }
+        operations = {request["id"]: operation for request, operation in batch}
+        try:
+            response = sessions.get('graph').post(
+                f"{GRAPH_BASE_URL}/$batch",
+                headers=headers,
+                json={"requests": [request for request, _ in batch]},
+                timeout=30
+            )
+        except requests.exceptions.RequestException as e:
+            logging.error(f"Graph batch request failed: {e}")
+            return {request_id: None for request_id in operations}, None
+        if response.status_code != 200:
+            logging.error(f"Graph batch request failed: {response.status_code} - {response.text}")
+            return {request_id: response.status_code for request_id in operations}, self._retry_after(response.headers)
+
+        statuses = {}
+        retry_after = None
+        for result in response.json().get('responses', []):
+            request_id = result.get('id')
+            status = result.get('status')
+            statuses[request_id] = status
+            operation = operations.get(request_id, {})
+            description = operation.get('description', f"request {request_id}")
+            if status in operation.get('expected', (200, 201, 202, 204)):
+                logging.info(f"Graph batch: {description} succeeded.")
+            elif status == 424:
+                logging.error(f"Graph batch: {description} skipped because an earlier step failed.")
+            else:
+                logging.error(f"Graph batch: {description} failed: {status} - {result.get('body')}")
+                delay = self._retry_after(result.get('headers'))
+                if delay is not None:
+                    retry_after = max(retry_after or 0, delay)
+        return statuses, retry_after
+
+
+class ProcessedMessageStore:
+    """
+    Remembers which Outlook messages have been ingested, in the processed_messages table.
+
+    Membership checks are primary-key lookups, each run only inserts the IDs it processed,
+    and entries older than the retention period are pruned. Writes join the caller's
+    transaction, so they commit atomically with the requests created from the same emails.
+    """
+
+    def __init__(self, retention_days=30):
+        self.retention_days = retention_days
+
+    def contains(self, message_id):
+        """Check whether a single message has been processed."""
+        return db.session.get(ProcessedMessage, message_id) is not None
+
+    def seen(self, message_ids, chunk_size=500):
+        """Return the subset of ``message_ids`` that has already been processed."""
+        message_ids = list(message_ids)
+        seen_ids = set()
+        for start in range(0, len(message_ids), chunk_size):
+            seen_ids.update(
+                message_id for (message_id,) in db.session.query(ProcessedMessage.message_id).filter(
+                    ProcessedMessage.message_id.in_(message_ids[start:start + chunk_size])
+                )
+            )
+        return seen_ids
+
+    def add(self, message_ids):
+        """Record newly processed message IDs. The caller commits."""
+        message_ids = set(message_ids)
+        new_ids = message_ids - self.seen(message_ids)
+        if new_ids:
+            processed_at = datetime.now()
+            db.session.execute(
+                insert(ProcessedMessage),
+                [{'message_id': message_id, 'processed_at': processed_at} for message_id in new_ids]
+            )
+        return len(new_ids)
+
+    def prune(self):
+        """Forget messages processed before the retention period. The caller commits."""
+        cutoff = datetime.now() - timedelta(days=self.retention_days)
+        return ProcessedMessage.query.filter(ProcessedMessage.processed_at < cutoff).delete(synchronize_session=False)
+
+
+class TokenManager:
+    """
+    Process-wide holder for the Microsoft Graph access token.
+
+    The token is served from memory until shortly before it expires, a daemon timer
+    refreshes it silently ahead of expiry, and the MSAL cache file is only rewritten
+    (atomically) when MSAL reports that it changed.
+    """
+    EXPIRY_MARGIN = 60  # Seconds before expiry after which a cached token is no longer served
+    REFRESH_AHEAD = 300  # Seconds before expiry at which the background refresh runs
+
+    def __init__(self, client_id, tenant_id, scopes, cache_file_path):
+        self.scopes = scopes
+        self.cache_file_path = cache_file_path
         self.token_cache = self._load_token_cache()
         self.app = PublicClientApplication(
-            CLIENT_ID,
-            authority=AUTHORITY,
-            token_cache=self.token_cache
+            client_id,
+            authority=f"https://login.microsoftonline.com/{tenant_id}",
+            token_cache=self.token_cache,
+            http_client=sessions.proxy('graph')
         )
+        self._lock = threading.Lock()
+        self._access_token = None
+        self._expires_at = 0
+        self._refresh_timer = None
 
     def _load_token_cache(self):
         """Load token cache from file."""
         token_cache = SerializableTokenCache()
-        if os.path.exists(CACHE_FILE_PATH):
-            with open(CACHE_FILE_PATH, 'r') as cache_file:
+        if os.path.exists(self.cache_file_path):
+            with open(self.cache_file_path, 'r') as cache_file:
                 token_cache.deserialize(cache_file.read())
         return token_cache
 
     def _save_token_cache(self):
-        """Save token cache to file."""
-        if self.token_cache.has_state_changed:
-            with open(CACHE_FILE_PATH, 'w') as cache_file:
+        """Atomically replace the token cache file if MSAL changed the cache."""
+        if not self.token_cache.has_state_changed:
+            return
+        cache_dir = os.path.dirname(os.path.abspath(self.cache_file_path))
+        fd, temp_path = tempfile.mkstemp(dir=cache_dir, prefix='.token_cache.')
+        try:
+            with os.fdopen(fd, 'w') as cache_file:
                 cache_file.write(self.token_cache.serialize())
+            os.replace(temp_path, self.cache_file_path)
+        except Exception:
+            os.remove(temp_path)
+            raise
 
-    def get_access_token(self):
-        """Get a valid access token for Microsoft Graph API."""
-        accounts = self.app.get_accounts()
-        result = None
+    def get_token(self, interactive=True):
+        """
+        Return a valid access token, acquiring one only when the cached token is about to expire.
+
+        Args:
+            interactive (bool): Fall back to interactive sign-in if no silent token is available.
+
+        Returns:
+            str: The access token, or None if none could be acquired.
+        """
+        if self._access_token and time.time() < self._expires_at - self.EXPIRY_MARGIN:
+            return self._access_token
+        with self._lock:
+            if self._access_token and time.time() < self._expires_at - self.EXPIRY_MARGIN:
+                return self._access_token
+            return self._acquire(interactive=interactive)
+
+    def _acquire(self, interactive=True, force_refresh=False):
+        """Acquire a token through MSAL and schedule its background refresh. Call with the lock held."""
         try:
+            accounts = self.app.get_accounts()
+            result = None
             if accounts:
-                result = self.app.acquire_token_silent(SCOPES, account=accounts[0])
-            if not result:
-                result = self.app.acquire_token_interactive(scopes=SCOPES)
+                result = self.app.acquire_token_silent(self.scopes, account=accounts[0], force_refresh=force_refresh)
+            if not result and interactive:
+                result = self.app.acquire_token_interactive(scopes=self.scopes)
             self._save_token_cache()
             if result and "access_token" in result:
+                self._access_token = result['access_token']
+                self._expires_at = time.time() + int(result.get('expires_in', 3600))
+                self._schedule_refresh()
                 logging.info("Access token acquired successfully.")
-                return result['access_token']
+                return self._access_token
             else:
                 raise Exception(f"Failed to acquire access token. Result: {result}")
         except Exception as e:
             logging.error(f"Error during token acquisition: {e}")
             return None
 
-    def get_filtered_emails(self, access_token):
-        """Retrieve unread emails filtered by subject."""
-        if not access_token:
-            logging.error("No valid access token provided.")
-            return []
+    def _schedule_refresh(self):
+        if self._refresh_timer:
+            self._refresh_timer.cancel()
+        delay = max(self._expires_at - self.REFRESH_AHEAD - time.time(), 30)
+        self._refresh_timer = threading.Timer(delay, self._refresh)
+        self._refresh_timer.daemon = True
+        self._refresh_timer.start()
 
-        headers = {
-            "Authorization": f"Bearer {access_token}",
-            "Accept": "application/json"
-        }
-        url = "https://graph.microsoft.com/v1.0/me/messages?$filter=isRead eq false and (subject eq 'TV Show Request' or subject eq 'Movie Request' or subject eq 'Music Request')"
-        response = requests.get(url, headers=headers)
-        if response.status_code == 200:
-            return response.json().get('value', [])
-        else:
-            logging.error(f"Failed to get emails: {response.status_code} - {response.text}")
-            return []
-
-    def mark_as_read_and_delete(self, access_token, email_id):
-        """Mark an email as read and move it to the 'Deleted Items' folder."""
+    def _refresh(self):
+        """Silently renew the token ahead of expiry; interactive sign-in is left to the next caller."""
+        with self._lock:
+            self._acquire(interactive=False, force_refresh=True)
+
+
+_token_manager = None
+_token_manager_lock = threading.Lock()
+
+
+def get_token_manager():
+    """Return the TokenManager shared by every OutlookHelper in this process."""
+    global _token_manager
+    if _token_manager is None:
+        with _token_manager_lock:
+            if _token_manager is None:
+                config = Config()
+                _token_manager = TokenManager(
+                    config.OUTLOOK_CLIENT_ID,
+                    config.OUTLOOK_TENANT_ID,
+                    config.OUTLOOK_SCOPES,
+                    config.OUTLOOK_CACHE_FILE_PATH
+                )
+    return _token_manager
+
+
+def _reset_token_manager(config):
+    """Drop the shared TokenManager so the next caller builds one from the new MicrosoftGraph settings."""
+    global _token_manager
+    with _token_manager_lock:
+        if _token_manager and _token_manager._refresh_timer:
+            _token_manager._refresh_timer.cancel()
+        _token_manager = None
+
+
+config_store.subscribe('MicrosoftGraph', _reset_token_manager)
+
+
+class OutlookHelper:
+    def __init__(self):
+        config = Config()
+        self.token_manager = get_token_manager()
+        self.processed_messages = ProcessedMessageStore(config.OUTLOOK_PROCESSED_RETENTION_DAYS)
+        self.extract_workers = config.OUTLOOK_EXTRACT_WORKERS
+
+    def get_access_token(self):
+        """Get a valid access token for Microsoft Graph API."""
+        return self.token_manager.get_token()
+
+    def get_new_emails(self, access_token, page_size=50):
+        """
+        Retrieve unread request emails that are new or changed since the last poll.
+
+        Uses the inbox delta query, following @odata.nextLink pages, so each poll costs
+        O(new mail) instead of re-querying the whole mailbox. The first poll (or one after
+        Graph invalidates the delta token) walks the inbox once to establish a baseline.
+
+        Returns:
+            tuple: (emails, delta_link). Pass delta_link to save_delta_link once the emails
+            have been processed; it is None if the round did not complete.
+        """
         if not access_token:
             logging.error("No valid access token provided.")
-            return
+            return [], None
 
         headers = {
             "Authorization": f"Bearer {access_token}",
-            "Content-Type": "application/json"
+            "Accept": "application/json",
+            # Plain-text bodies make title extraction trivial
+            "Prefer": f'odata.maxpagesize={page_size}, outlook.body-content-type="text"'
         }
+        initial_url = f"{GRAPH_BASE_URL}/me/mailFolders/inbox/messages/delta?$select=id,subject,body,isRead"
+        state = db.session.get(SyncState, INBOX_DELTA_STATE)
+        url = state.cursor if state and state.cursor else initial_url
 
-        # Mark the email as read
-        mark_read_url = f"https://graph.microsoft.com/v1.0/me/messages/{email_id}"
-        mark_read_data = {"isRead": True}
-        read_response = requests.patch(mark_read_url, headers=headers, json=mark_read_data)
-        if read_response.status_code == 200:
-            logging.info(f"Marked email {email_id} as read.")
-        else:
-            logging.error(f"Failed to mark email as read: {read_response.status_code} - {read_response.text}")
-
-        # Move the email to "Deleted Items"
-        move_url = f"https://graph.microsoft.com/v1.0/me/messages/{email_id}/move"
-        move_data = {"destinationId": "deleteditems"}
-        move_response = requests.post(move_url, headers=headers, json=move_data)
-        if move_response.status_code == 201:
-            logging.info(f"Moved email {email_id} to Deleted Items.")
-        else:
-            logging.error(f"Failed to move email to Deleted Items: {move_response.status_code} - {move_response.text}")
-
-    def load_processed_message_ids(self):
-        """Load processed message IDs from a JSON file."""
-        if os.path.exists(CACHE_FILE_PATH):
+        emails = []
+        while url:
             try:
-                with open(CACHE_FILE_PATH, 'r', encoding='utf-8') as file:
-                    data = json.load(file)
-                    return set(data) if isinstance(data, list) else set()
-            except json.JSONDecodeError:
-                logging.warning("Processed messages file is corrupted or empty. Resetting to empty.")
-                return set()
-        return set()
-
-    def save_processed_message_ids(self, message_ids):
-        """Save processed message IDs to a JSON file."""
-        with open(CACHE_FILE_PATH, 'w', encoding='utf-8') as file:
-            json.dump(list(message_ids), file)
-
-    def send_reply_email(self, access_token, email, itemname, category):
-        """Send a reply email confirming receipt of a request."""
-        if not access_token:
-            logging.error("No valid access token provided.")
+                response = sessions.get('graph').get(url, headers=headers, timeout=30)
+            except requests.exceptions.RequestException as e:
+                logging.error(f"Failed to get email changes: {e}")
+                return emails, None
+            if response.status_code == 410 and url != initial_url:
+                logging.warning("Outlook delta token expired; starting a new inbox delta round.")
+                url = initial_url
+                continue
+            if response.status_code != 200:
+                logging.error(f"Failed to get email changes: {response.status_code} - {response.text}")
+                return emails, None
+
+            data = response.json()
+            for message in data.get('value', []):
+                subject = (message.get('subject') or '').strip().lower()
+                if '@removed' in message or message.get('isRead') or subject not in REQUEST_SUBJECTS:
+                    continue
+                emails.append(message)
+            url = data.get('@odata.nextLink')
+            if '@odata.deltaLink' in data:
+                logging.info(f"Outlook delta round returned {len(emails)} new request emails.")
+                return emails, data['@odata.deltaLink']
+        return emails, None
+
+    def save_delta_link(self, delta_link):
+        """Persist the delta link so the next poll only returns later changes."""
+        if not delta_link:
             return
+        state = db.session.get(SyncState, INBOX_DELTA_STATE) or SyncState(name=INBOX_DELTA_STATE)
+        state.cursor = delta_link
+        state.last_synced_at = datetime.now()
+        db.session.add(state)
+        db.session.commit()
 
-        reply_body = f"Thank you for your message. The {itemname} has been added to the {category} list."
-        headers = {
-            "Authorization": f"Bearer {access_token}",
-            "Content-Type": "application/json"
-        }
-        reply_url = f"https://graph.microsoft.com/v1.0/me/messages/{email['id']}/reply"
-        data = {
-            "message": {
-                "body": {
-                    "content": reply_body
+    @staticmethod
+    def reply_operation(email, itemname, category):
+        """Build the Graph batch operation that replies to a request email."""
+        return {
+            "method": "POST",
+            "url": f"/me/messages/{email['id']}/reply",
+            "body": {
+                "message": {
+                    "body": {
+                        "content": f"Thank you for your message. The {itemname} has been added to the {category} list."
+                    }
                 }
-            }
+            },
+            "expected": (202,),
+            "description": f"reply for {itemname}"
         }
-        response = requests.post(reply_url, headers=headers, json=data)
-        if response.status_code == 202:
-            logging.info(f"Reply sent for {itemname}")
-        else:
-            logging.error(f"Failed to send reply email: {response.status_code} - {response.text}")
+
+    @staticmethod
+    def mark_as_read_and_delete_operations(email_id):
+        """Build the Graph batch operations that mark an email as read and move it to 'Deleted Items'."""
+        return [
+            {
+                "method": "PATCH",
+                "url": f"/me/messages/{email_id}",
+                "body": {"isRead": True},
+                "expected": (200,),
+                "description": f"mark email {email_id} as read"
+            },
+            {
+                "method": "POST",
+                "url": f"/me/messages/{email_id}/move",
+                "body": {"destinationId": "deleteditems"},
+                "expected": (201,),
+                "description": f"move email {email_id} to Deleted Items"
+            }
+        ]
 
     def process_requests(self, emails, access_token):
-        """Process emails, categorize them, and add to the SQL database."""
+        """
+        Turn request emails into Request rows in a single transaction.
+
+        Titles are extracted from every email first and deduplicated in memory, existing
+        requests are found with one IN query, and all new requests plus the processed
+        message IDs are committed together. Replies and mark-as-read/move operations are
+        only sent through Graph after that commit succeeds.
+
+        Raises:
+            Exception: If the requests could not be committed (the session is rolled back).
+                The caller must not save the round's delta link, or these emails are lost.
+        """
         if not emails:
             logging.info("No emails to process.")
             return
 
-        processed_message_ids = self.load_processed_message_ids()
-
+        processed_message_ids = self.processed_messages.seen(email['id'] for email in emails if email.get('id'))
+        candidates = []
         for email in emails:
             email_id = email.get('id')
             if not email_id or email_id in processed_message_ids:
                 continue
+            subject = (email.get('subject') or '').strip()
+            category = request_category(subject)
+            if not category:
+                logging.info(f"Unknown request type in subject: {subject}")
+                continue
+            processed_message_ids.add(email_id)
+            candidates.append((email, category))
 
-            subject = email.get('subject', '').strip()
-            body = email.get('body', {}).get('content', '').strip()
-            soup = BeautifulSoup(body, 'html.parser')
-            title = soup.get_text(separator=" ", strip=True).strip()
-
+        titles = extract_titles(
+            [(email.get('body') or {}).get('content') or '' for email, _ in candidates],
+            workers=self.extract_workers
+        )
+        parsed = []
+        for (email, category), title in zip(candidates, titles):
             if not title:
-                logging.warning(f"No valid title found in the email with ID {email_id}")
+                logging.warning(f"No valid title found in the email with ID {email['id']}")
                 continue
+            parsed.append((email, category, title[:255]))
+        if not parsed:
+            return
 
-            category = None
-            if "tv show request" in subject.lower():
-                category = 'TV Show'
-            elif "movie request" in subject.lower():
-                category = 'Movie'
-            elif "music request" in subject.lower():
-                category = 'Music'
-            else:
-                logging.info(f"Unknown request type in subject: {subject}")
-                continue
+        keys = {(title, category) for _, category, title in parsed}
+        existing_keys = set(
+            db.session.query(Request.title, Request.media_type).filter(tuple_(Request.title, Request.media_type).in_(list(keys)))
+        )
 
-            # Check if the request already exists in the database
-            existing_request = Request.query.filter_by(title=title, media_type=category).first()
-            if existing_request:
+        new_requests = {}
+        replies = []
+        for email, category, title in parsed:
+            if (title, category) in existing_keys:
                 logging.info(f"{category} '{title}' is already in the database.")
-            else:
-                # Add the new request to the database
-                new_request = Request(
-                    user_id=None,  # Specify user ID if known or assign it dynamically
-                    media_type=category,
-                    title=title,
-                    status='Pending',
-                    requested_at=datetime.now()
-                )
-                db.session.add(new_request)
-                db.session.commit()
-                logging.info(f"Added {category} request: {title}")
-                self.send_reply_email(access_token, email, title, category)
+            elif (title, category) not in new_requests:
+                new_requests[(title, category)] = {
+                    'user_id': None,  # Specify user ID if known or assign it dynamically
+                    'media_type': category,
+                    'title': title,
+                    'status': 'Pending',
+                    'requested_at': datetime.now()
+                }
+                replies.append((email, title, category))
 
-            processed_message_ids.add(email_id)
-            self.mark_as_read_and_delete(access_token, email_id)
+        try:
+            if new_requests:
+                db.session.execute(insert(Request), list(new_requests.values()))
+            self.processed_messages.add(email['id'] for email, _, _ in parsed)
+            self.processed_messages.prune()
+            db.session.commit()
+            logging.info(f"Added {len(new_requests)} requests from {len(parsed)} emails.")
+        except Exception as e:
+            db.session.rollback()
+            logging.error(f"Failed to store requests from emails: {e}")
+            raise
+
+        # Replies are sent through /$batch first: the move changes the message ID, so it must run
+        # after the reply, but a failed reply must not leave the email unread in the inbox
+        replies_batch = GraphBatch(access_token)
+        for email, title, category in replies:
+            replies_batch.add_group([self.reply_operation(email, title, category)])
+        replies_batch.flush()
 
-        self.save_processed_message_ids(processed_message_ids)
+        cleanup_batch = GraphBatch(access_token)
+        for email, _, _ in parsed:
+            cleanup_batch.add_group(self.mark_as_read_and_delete_operations(email['id']))
+        cleanup_batch.flush()
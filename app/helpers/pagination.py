@@ -0,0 +1,32 @@
+import base64
+import json
+
+
+def encode_cursor(values):
+    """Encode the sort key of the last row on a page as an opaque, URL-safe cursor."""
+    return base64.urlsafe_b64encode(json.dumps(list(values), separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, size):
+    """
+    Decode a cursor made by encode_cursor.
+
+    Args:
+        cursor (str): Cursor from a previous page, or None/'' for the first page.
+        size (int): Number of sort key values the cursor must hold.
+
+    Returns:
+        tuple: The sort key values, or None for the first page.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    return tuple(values)
@@ -0,0 +1,95 @@
+import logging
+from contextlib import nullcontext
+from sqlalchemy import insert
+from app.models import db, Media, Recommendation, User
+from app.helpers.registry import registry
+
+logging.basicConfig(level=logging.INFO)
+
+
+def generate_recommendations(user_ids, recorder=None):
+    """
+    Fetch TMDb recommendations for every available movie and show and store the new ones for ``user_ids``.
+
+    TMDb is queried once per title however many users are served, and all new
+    recommendations are written with one executemany INSERT. Titles TMDb fails for are
+    logged and skipped. Used by the /generate-recommendations view (for the current user)
+    and the daily recommendations job (for every active user).
+
+    Args:
+        user_ids (list): IDs of the users to store recommendations for.
+        recorder (JobRecorder): Optional; receives 'tmdb' and 'db' stage timings and counts.
+
+    Returns:
+        list: Dicts with 'original_title', 'recommended_title' and 'media_type' for each new recommendation.
+
+    Raises:
+        HelperUnavailable: If TMDb is not configured.
+        SQLAlchemyError: If the recommendations cannot be stored (the session is rolled back).
+    """
+    stage = recorder.stage if recorder else (lambda name: nullcontext())
+    tmdb_helper = registry.get('tmdb')
+    with stage('db'):
+        titles = db.session.query(Media.title, Media.media_type).filter(
+            Media.status == 'Available', Media.media_type != 'Music'  # TMDb has no music
+        ).distinct().all()
+
+    generated = {}
+    failed = 0
+    for title, media_type in titles:
+        try:
+            with stage('tmdb'):
+                # get_recommendations expects 'movie' or 'tv show'; rows keep the library's media type
+                recommendations = tmdb_helper.get_recommendations(title=title, media_type=media_type.lower())
+        except Exception as e:
+            logging.error(f"Error fetching recommendations for '{title}': {e}")
+            failed += 1
+            continue
+        for rec in recommendations:
+            # A title in the library as both a movie and a show can yield the same pair twice
+            generated.setdefault((title, rec['title']), {
+                'original_title': title,
+                'recommended_title': rec['title'],
+                'media_type': media_type,
+                'url': rec.get('url'),
+                'overview': rec.get('overview'),
+                'thumbnail_url': rec.get('thumbnail_url')
+            })
+
+    rows = [
+        {
+            'user_id': user_id,
+            'media_title': rec['original_title'],
+            'related_media_title': rec['recommended_title'],
+            'media_type': rec['media_type'],
+            'url': rec['url'],
+            'description': rec['overview'],
+            'overview': rec['overview'],
+            'thumbnail_url': rec['thumbnail_url']
+        }
+        for user_id in user_ids for rec in generated.values()
+    ]
+    with stage('db'):
+        try:
+            if rows:
+                db.session.execute(insert(Recommendation), rows)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+    if recorder:
+        recorder.add_counts({'recommendations': len(rows), 'failed_titles': failed}, items=len(titles))
+    logging.info(
+        f"Stored {len(rows)} recommendations for {len(user_ids)} users from {len(titles)} library titles "
+        f"({failed} failed)."
+    )
+    return [
+        {key: rec[key] for key in ('original_title', 'recommended_title', 'media_type')}
+        for rec in generated.values()
+    ]
+
+
+def active_user_ids():
+    """IDs of the users the daily recommendations job serves."""
+    return [user_id for (user_id,) in db.session.query(User.id).filter(User.status == 'Active')]
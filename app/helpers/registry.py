@@ -0,0 +1,156 @@
+import importlib
+import logging
+import threading
+import time
+from config import config_store
+
+logging.basicConfig(level=logging.INFO)
+
+# Seconds to wait before trying to construct a helper again after it failed
+RETRY_AFTER = 30
+
+
+class HelperUnavailable(RuntimeError):
+    """Raised when a registered helper cannot be constructed (e.g. its backend is down)."""
+
+
+class HelperProxy:
+    """Module-level stand-in for a helper that resolves it from the registry on first attribute access."""
+
+    def __init__(self, registry, name):
+        self._registry = registry
+        self._name = name
+
+    def __getattr__(self, attr):
+        return getattr(self._registry.get(self._name), attr)
+
+    def __repr__(self):
+        return f"<HelperProxy {self._name}>"
+
+
+class HelperRegistry:
+    """
+    Lazily constructed, per-process helper singletons.
+
+    Each helper is built the first time it is requested, under a per-name lock so
+    concurrent requests share one instance and one connection/login. A failed
+    construction is remembered for RETRY_AFTER seconds, during which callers get
+    HelperUnavailable straight away instead of waiting on the backend again.
+    """
+
+    def __init__(self, retry_after=RETRY_AFTER):
+        self.retry_after = retry_after
+        self._lock = threading.Lock()
+        self._factories = {}
+        self._locks = {}
+        self._instances = {}
+        self._status = {}
+
+    def register(self, name, factory, section=None):
+        """
+        Register a helper factory.
+
+        Args:
+            name (str): Service name used with get().
+            factory: Callable returning the helper, or a 'module:attribute' path to one
+                (imported on first use so registering costs nothing).
+            section (str): config.yaml section the helper reads; when it changes the helper
+                is dropped and rebuilt on next use.
+        """
+        if section:
+            config_store.subscribe(section, lambda config: self.reset(name))
+        with self._lock:
+            self._factories[name] = factory
+            self._locks.setdefault(name, threading.Lock())
+            self._status[name] = {'state': 'not_started', 'error': None, 'created_at': None, 'init_seconds': None}
+            self._instances.pop(name, None)
+
+    def get(self, name):
+        """Return the helper registered under ``name``, constructing it on first use."""
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+        if name not in self._factories:
+            raise KeyError(f"No helper registered under '{name}'.")
+
+        with self._locks[name]:
+            instance = self._instances.get(name)
+            if instance is not None:
+                return instance
+
+            status = self._status[name]
+            if status['state'] == 'error' and time.time() - status['failed_at'] < self.retry_after:
+                raise HelperUnavailable(f"{name} is unavailable: {status['error']}")
+
+            started = time.perf_counter()
+            try:
+                instance = self._resolve(self._factories[name])()
+            except Exception as e:
+                self._status[name] = {
+                    'state': 'error', 'error': str(e), 'created_at': None,
+                    'init_seconds': round(time.perf_counter() - started, 3), 'failed_at': time.time()
+                }
+                logging.error(f"Error initializing helper '{name}': {e}")
+                raise HelperUnavailable(f"{name} is unavailable: {e}") from e
+
+            self._instances[name] = instance
+            self._status[name] = {
+                'state': 'ready', 'error': None, 'created_at': time.time(),
+                'init_seconds': round(time.perf_counter() - started, 3)
+            }
+            logging.info(f"Helper '{name}' initialized in {self._status[name]['init_seconds']}s.")
+            return instance
+
+    def proxy(self, name):
+        """Return a HelperProxy for ``name``, for use as a module-level helper."""
+        return HelperProxy(self, name)
+
+    def reset(self, name=None):
+        """Drop one helper (or all of them) so the next get() constructs it again."""
+        names = [name] if name else list(self._factories)
+        for helper_name in names:
+            if helper_name in self._instances:
+                logging.info(f"Helper '{helper_name}' will be rebuilt on next use.")
+            with self._locks[helper_name]:
+                self._instances.pop(helper_name, None)
+                self._status[helper_name] = {
+                    'state': 'not_started', 'error': None, 'created_at': None, 'init_seconds': None
+                }
+
+    def status(self, check=False):
+        """
+        Report the health of every registered helper.
+
+        Args:
+            check (bool): Try to construct helpers that are not ready yet.
+
+        Returns:
+            dict: Service name -> state ('not_started', 'ready' or 'error'), last error and init time.
+        """
+        if check:
+            for name in list(self._factories):
+                try:
+                    self.get(name)
+                except HelperUnavailable:
+                    pass
+        return {
+            name: {key: value for key, value in status.items() if key != 'failed_at'}
+            for name, status in self._status.items()
+        }
+
+    @staticmethod
+    def _resolve(factory):
+        if isinstance(factory, str):
+            module_name, attribute = factory.split(':')
+            return getattr(importlib.import_module(module_name), attribute)
+        return factory
+
+
+# Shared per-process registry; helpers are imported and built on first use
+registry = HelperRegistry()
+registry.register('jackett', 'app.helpers.jackett_helper:JackettHelper', section='Jackett')
+registry.register('qbittorrent', 'app.helpers.qbittorrent_helper:QBittorrentHelper', section='qBittorrent')
+registry.register('tmdb', 'app.helpers.tmdb_helper:TMDbHelper', section='TMDb')
+registry.register('jellyfin', 'app.helpers.jellyfin_helper:JellyfinHelper', section='Jellyfin')
+registry.register('spotify', 'app.helpers.spotofiy_helper:SpotifyHelper', section='Spotify')
+registry.register('outlook', 'app.helpers.outlook_helper:OutlookHelper', section='MicrosoftGraph')
@@ -0,0 +1,499 @@
+import logging
+import os
+import queue
+import random
+import re
+import socket
+import threading
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from app.models import db, Request
+from app.helpers.jackett_helper import normalize_media_type
+from app.helpers.async_engine import engine
+from app.helpers.registry import registry, HelperUnavailable
+from config import Config
+
+logging.basicConfig(level=logging.INFO)
+
+# Marks the end of the stream on a stage queue
+STOP = object()
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """Exponential backoff for one failure class: base * 2^(attempt - 1), capped, with +/-10% jitter."""
+    base_seconds: int
+    cap_seconds: int
+    max_attempts: int
+    final_status: str  # Status once max_attempts is reached: 'Failed' stops retrying, 'Waiting' rechecks rarely
+
+    def delay(self, attempts):
+        seconds = min(self.cap_seconds, self.base_seconds * 2 ** max(0, attempts - 1))
+        return timedelta(seconds=seconds * random.uniform(0.9, 1.1))
+
+
+RETRY_POLICIES = {
+    # TMDb has no match: the title is probably wrong, so give up after a day or so
+    'no_metadata': RetryPolicy(base_seconds=3600, cap_seconds=12 * 3600, max_attempts=5, final_status='Failed'),
+    # Nothing with seeders yet: common for unreleased titles, keep looking at a slowing pace
+    'no_seeders': RetryPolicy(base_seconds=1800, cap_seconds=24 * 3600, max_attempts=8, final_status='Waiting'),
+    # TMDb, Jackett or qBittorrent failed: retry quickly while the backend recovers
+    'backend_error': RetryPolicy(base_seconds=300, cap_seconds=3600, max_attempts=10, final_status='Waiting'),
+}
+FAILURE_CLASSES = {
+    'no_metadata': 'no_metadata',
+    'no_results': 'no_seeders',
+    'no_magnet': 'no_seeders',
+    'error': 'backend_error',
+}
+# How often Waiting requests are retried once their class has run out of attempts
+WAITING_RECHECK = timedelta(days=7)
+
+
+def schedule_retry(outcome, attempts, message, now=None):
+    """
+    Work out a failed request's next state.
+
+    Args:
+        outcome (str): Pipeline outcome (no_metadata, no_results, no_magnet or error).
+        attempts (int): Failed attempts including this one.
+        message (str): Error to record.
+
+    Returns:
+        dict: 'status', 'attempts', 'last_error' and 'next_attempt_at' for Request.release_failed.
+    """
+    now = now or datetime.utcnow()
+    policy = RETRY_POLICIES[FAILURE_CLASSES.get(outcome, 'backend_error')]
+    if attempts < policy.max_attempts:
+        status, next_attempt_at = 'Pending', now + policy.delay(attempts)
+    elif policy.final_status == 'Waiting':
+        status, next_attempt_at = 'Waiting', now + WAITING_RECHECK
+    else:
+        status, next_attempt_at = policy.final_status, None
+    return {'status': status, 'attempts': attempts, 'last_error': message, 'next_attempt_at': next_attempt_at}
+
+
+def get_download_path(title, media_type):
+    """Determine the correct directory path for the torrent download."""
+    title_for_path = re.sub(r'^(The|A|An)\s+', '', title, flags=re.IGNORECASE).strip()
+    first_letter = title_for_path[0].upper() if title_for_path else 'Misc'
+    media_type = media_type.lower() if media_type else None
+
+    if media_type == 'movie':
+        return f"E:\\Movies\\{first_letter}\\"
+    elif media_type == 'tv show':
+        return f"E:\\Tv Shows\\{first_letter}\\"
+    elif media_type == 'music':
+        return f"E:\\Music\\{first_letter}\\"
+    else:
+        raise ValueError(f"Unsupported media type: {media_type}. Cannot determine download path.")
+
+
+def music_search_title(metadata, title):
+    """Search title for a music request: the Spotify name, led by the first artist for tracks and albums."""
+    if not metadata:
+        return title
+    name = metadata.get('name') or title
+    artists = metadata.get('artists') or []
+    return f"{artists[0]['name']} {name}" if artists and artists[0].get('name') else name
+
+
+@dataclass
+class PipelineItem:
+    """One request as it moves through the pipeline. Workers only see this plain copy, never the ORM row."""
+    request_id: int
+    title: str
+    media_type: str
+    attempts: int = 0
+    validated_title: str = None
+    release_year: str = ''
+    search_results: list = field(default_factory=list)
+    magnet_link: str = None
+    download_path: str = None
+    outcome: str = None  # submitted, no_metadata, no_results, no_magnet or error
+    message: str = None
+
+    def finish(self, outcome, message):
+        self.outcome = outcome
+        self.message = message
+        return self
+
+
+@dataclass
+class PipelineReport:
+    items: list
+    counts: Counter
+    stage_seconds: dict
+    elapsed: float
+
+
+class Stage:
+    """
+    A pool of worker threads applying ``func`` to items from ``inbox``.
+
+    Items that come back with an outcome are finished and go straight to ``results``;
+    the rest continue to ``outbox``. Because the queues are bounded, a slow stage makes
+    the stages in front of it wait instead of buffering the whole backlog.
+    """
+
+    def __init__(self, name, func, workers, inbox, outbox, results):
+        self.name = name
+        self.func = func
+        self.workers = max(1, workers)
+        self.inbox = inbox
+        self.outbox = outbox
+        self.results = results
+        self.busy_seconds = 0.0
+        self._running = self.workers
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def start(self):
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"pipeline-{self.name}-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _work(self):
+        while True:
+            item = self.inbox.get()
+            if item is STOP:
+                # Let sibling workers see the end of the stream, and close the next stage after the last one exits
+                self.inbox.put(STOP)
+                with self._lock:
+                    self._running -= 1
+                    last = self._running == 0
+                if last:
+                    self.outbox.put(STOP)
+                return
+
+            started = time.perf_counter()
+            try:
+                item = self.func(item)
+            except Exception as e:
+                logging.error(f"Pipeline stage '{self.name}' failed for '{item.title}': {e}")
+                item.finish('error', f"{self.name} failed: {e}")
+            with self._lock:
+                self.busy_seconds += time.perf_counter() - started
+            (self.results if item.outcome else self.outbox).put(item)
+
+
+class AsyncStage(Stage):
+    """
+    A stage whose ``func`` is a coroutine run on the shared async engine.
+
+    ``workers`` is the number of items in flight rather than a thread count: one thread
+    hands items to the event loop and another forwards them as they complete, so a
+    stage can have hundreds of lookups outstanding without a thread for each. Busy
+    time is the summed latency of the items.
+    """
+
+    def start(self):
+        self._slots = threading.Semaphore(self.workers)
+        self._completed = queue.SimpleQueue()
+        for target, role in ((self._dispatch, 'dispatch'), (self._forward, 'forward')):
+            thread = threading.Thread(target=target, name=f"pipeline-{self.name}-{role}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _dispatch(self):
+        while True:
+            item = self.inbox.get()
+            if item is STOP:
+                # Wait for the items in flight to be forwarded, then close the stage
+                for _ in range(self.workers):
+                    self._slots.acquire()
+                self._completed.put(STOP)
+                return
+            self._slots.acquire()
+            started = time.perf_counter()
+            future = engine.submit(self.func(item))
+            # Runs on the event loop, so it must not block: the forward thread does the queue puts
+            future.add_done_callback(lambda done, item=item, started=started: self._completed.put((done, item, started)))
+
+    def _forward(self):
+        while True:
+            entry = self._completed.get()
+            if entry is STOP:
+                self.outbox.put(STOP)
+                return
+            done, item, started = entry
+            try:
+                item = done.result()
+            except Exception as e:
+                logging.error(f"Pipeline stage '{self.name}' failed for '{item.title}': {e}")
+                item.finish('error', f"{self.name} failed: {e}")
+            with self._lock:
+                self.busy_seconds += time.perf_counter() - started
+            (self.results if item.outcome else self.outbox).put(item)
+            self._slots.release()
+
+
+class RequestPipeline:
+    """
+    Processes requests through validate (TMDb) -> search (Jackett) -> rank -> submit
+    (qBittorrent) -> persist.
+
+    Validate and search are lookups run as coroutines on the async engine; rank and
+    submit run on worker threads.
+
+    Stage timings in the report use these names, plus 'db' for claiming and saving.
+    Each stage has its own worker pool sized from the Pipeline section of config.yaml,
+    so throughput is bounded by the slowest backend's parallel capacity rather than by
+    the sum of every call's latency. Persisting happens on the calling thread, which
+    owns the database session.
+    """
+
+    def __init__(self, settings=None):
+        self.settings = settings or Config().sections['Pipeline']
+
+    def run(self, requests, lease_owner):
+        """
+        Process ``requests`` and mark the ones submitted to qBittorrent as 'In Progress'.
+
+        Every request's lease is released once it finishes.
+
+        Args:
+            requests (list): Request rows claimed by ``lease_owner``.
+            lease_owner (str): Owner of the requests' leases.
+
+        Returns:
+            PipelineReport: Every item with its outcome, outcome counts and busy time per stage.
+        """
+        started = time.perf_counter()
+        items = [
+            PipelineItem(request.id, request.title, request.media_type, request.attempts or 0)
+            for request in requests
+        ]
+        if not items:
+            return PipelineReport([], Counter(), {}, 0.0)
+
+        try:
+            self.tmdb = registry.get('tmdb') if any(item.media_type != 'Music' for item in items) else None
+            self.jackett = registry.get('jackett')
+            self.qbittorrent = registry.get('qbittorrent')
+            spotify_started = time.perf_counter()
+            self.music_metadata = self._music_metadata(requests)
+            spotify_seconds = time.perf_counter() - spotify_started
+        except HelperUnavailable as e:
+            # Count the attempt so the batch backs off instead of being reclaimed every tick
+            for item in items:
+                item.finish('error', str(e))
+            db_seconds = self._release([], items, lease_owner)
+            return PipelineReport(
+                items, Counter(item.outcome for item in items), {'db': round(db_seconds, 3)},
+                round(time.perf_counter() - started, 3)
+            )
+
+        size = self.settings.queue_size
+        validate_queue, search_queue, rank_queue, submit_queue = (queue.Queue(size) for _ in range(4))
+        results = queue.Queue(size)
+        stages = [
+            AsyncStage('validate', self._validate, self.settings.validate_workers, validate_queue, search_queue, results),
+            AsyncStage('search', self._search, self.settings.search_workers, search_queue, rank_queue, results),
+            Stage('rank', self._rank, self.settings.rank_workers, rank_queue, submit_queue, results),
+            Stage('submit', self._submit, self.settings.submit_workers, submit_queue, results, results),
+        ]
+        for stage in stages:
+            stage.start()
+        threading.Thread(target=self._feed, args=(items, validate_queue), name='pipeline-feed', daemon=True).start()
+
+        finished, db_seconds = self._persist(results, lease_owner, {item.request_id for item in items})
+        report = PipelineReport(
+            items=finished,
+            counts=Counter(item.outcome for item in finished),
+            stage_seconds={
+                'spotify': round(spotify_seconds, 3),
+                **{stage.name: round(stage.busy_seconds, 3) for stage in stages},
+                'db': round(db_seconds, 3)
+            },
+            elapsed=round(time.perf_counter() - started, 3)
+        )
+        logging.info(
+            f"Processed {len(finished)} requests in {report.elapsed}s: {dict(report.counts)}; "
+            f"busy seconds per stage: {report.stage_seconds}"
+        )
+        return report
+
+    @staticmethod
+    def _music_metadata(requests):
+        """
+        Resolve every music request of the batch on Spotify in one bulk lookup.
+
+        Titles resolved by earlier runs come from the persisted lookups, so Spotify is only
+        searched for new titles. Without Spotify, music requests keep their titles.
+
+        Returns:
+            dict: Request ID -> Spotify object, or None if the title did not match.
+        """
+        music = [request for request in requests if request.media_type == 'Music']
+        if not music:
+            return {}
+        try:
+            return registry.get('spotify').enrich_requests(music)
+        except HelperUnavailable as e:
+            logging.warning(f"Searching music requests by their titles: {e}")
+            return {}
+
+    @staticmethod
+    def _feed(items, inbox):
+        for item in items:
+            inbox.put(item)
+        inbox.put(STOP)
+
+    async def _validate(self, item):
+        """
+        Resolve the canonical title and year on TMDb. Music uses the Spotify match resolved for the batch.
+
+        Only a TMDb search that answered with no match is no_metadata; an unreachable TMDb
+        raises, which the stage records as an error so the request is retried as a backend failure.
+        """
+        if item.media_type == 'Music':
+            item.validated_title = music_search_title(self.music_metadata.get(item.request_id), item.title)
+            return item
+        media = await self.tmdb.get_media_details_async(item.title, item.media_type.lower())
+        if not media:
+            return item.finish('no_metadata', f"No valid media found for {item.title} on TMDB.")
+        item.validated_title = media.get('title') if item.media_type == 'Movie' else media.get('name')
+        item.validated_title = item.validated_title or item.title
+        item.release_year = (media.get('release_date') or media.get('first_air_date') or '')[:4]
+        return item
+
+    async def _search(self, item):
+        """Search Jackett. An unreachable Jackett raises, which the stage records as an error rather than no_results."""
+        query = f"{item.validated_title} {item.release_year}".strip()
+        item.search_results = await self.jackett.search_jackett_async(query=query, category=normalize_media_type(item.media_type))
+        if not item.search_results:
+            return item.finish('no_results', f"No results found for {item.validated_title}.")
+        return item
+
+    def _rank(self, item):
+        """Pick the best-seeded result with a usable magnet link."""
+        candidates = [
+            result for result in item.search_results
+            if (result.get('magnet') or '').startswith('magnet:?')
+        ]
+        if not candidates:
+            return item.finish('no_magnet', f"No valid magnet link found for {item.validated_title}.")
+        item.magnet_link = max(candidates, key=lambda result: result.get('seeders', 0))['magnet']
+        item.download_path = get_download_path(item.title, item.media_type)
+        return item
+
+    def _submit(self, item):
+        self.qbittorrent.add_torrent(item.magnet_link, save_path=item.download_path)
+        return item.finish('submitted', f"Started download for {item.title}.")
+
+    def _persist(self, results, lease_owner, pending_ids):
+        """
+        Drain finished items, releasing their leases in batches.
+
+        Submitted requests become 'In Progress'; the rest are rescheduled with schedule_retry.
+        Leases of requests still in the pipeline are renewed every third of lease_seconds, so a
+        run that outlasts the lease is not claimed (and downloaded) by another worker.
+
+        Returns:
+            tuple: Finished items and the seconds spent writing to the database.
+        """
+        finished, submitted, unresolved = [], [], []
+        db_seconds = 0.0
+        renew_every = max(1, self.settings.lease_seconds // 3)
+        renew_at = time.monotonic() + renew_every
+        while True:
+            try:
+                item = results.get(timeout=max(0.0, renew_at - time.monotonic()))
+            except queue.Empty:
+                db_seconds += self._renew(pending_ids, lease_owner, self.settings.lease_seconds)
+                renew_at = time.monotonic() + renew_every
+                continue
+            if item is STOP:
+                break
+            pending_ids.discard(item.request_id)
+            finished.append(item)
+            (submitted if item.outcome == 'submitted' else unresolved).append(item)
+            if len(submitted) + len(unresolved) >= self.settings.persist_batch_size:
+                db_seconds += self._release(submitted, unresolved, lease_owner)
+                submitted, unresolved = [], []
+        db_seconds += self._release(submitted, unresolved, lease_owner)
+        return finished, db_seconds
+
+    @staticmethod
+    def _renew(pending_ids, lease_owner, lease_seconds):
+        """Extend the leases of requests still in the pipeline and return the seconds it took."""
+        started = time.perf_counter()
+        try:
+            Request.renew_leases(pending_ids, lease_owner, lease_seconds)
+        except Exception as e:
+            db.session.rollback()
+            logging.error(f"Error renewing the leases of {len(pending_ids)} requests: {e}")
+        return time.perf_counter() - started
+
+    @staticmethod
+    def _release(submitted, unresolved, lease_owner):
+        """Save a batch of finished items and return the seconds it took."""
+        started = time.perf_counter()
+        now = datetime.utcnow()
+        failures = []
+        for item in unresolved:
+            failure = schedule_retry(item.outcome, item.attempts + 1, item.message, now)
+            failures.append({'id': item.request_id, **failure})
+            if failure['status'] != 'Pending':
+                logging.info(f"Request '{item.title}' is now {failure['status']} after {failure['attempts']} attempts.")
+        try:
+            Request.release(
+                [item.request_id for item in submitted], lease_owner,
+                status='In Progress', last_error=None, next_attempt_at=None
+            )
+            Request.release_failed(lease_owner, failures)
+        except Exception as e:
+            db.session.rollback()
+            logging.error(f"Error saving results for {len(submitted) + len(unresolved)} requests: {e}")
+        return time.perf_counter() - started
+
+
+def lease_owner_id():
+    """Return a lease owner unique to this run: host, process and a random suffix."""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def process_pending_requests():
+    """
+    Claim pending requests in batches and run them through the pipeline until none are left.
+
+    Claims are leases, so several workers (threads, processes or hosts) can run this at
+    once without processing the same request twice.
+    """
+    pipeline = RequestPipeline()
+    settings = pipeline.settings
+    owner = lease_owner_id()
+    handled = set()
+    reports = []
+    claim_seconds = 0.0
+    while True:
+        started = time.perf_counter()
+        batch = Request.claim_pending(owner, settings.claim_batch_size, settings.lease_seconds, exclude_ids=handled)
+        claim_seconds += time.perf_counter() - started
+        if not batch:
+            break
+        logging.info(f"Claimed {len(batch)} pending requests as {owner}.")
+        handled.update(request.id for request in batch)
+        reports.append(pipeline.run(batch, owner))
+    report = merge_reports(reports)
+    report.stage_seconds['db'] = round(report.stage_seconds.get('db', 0.0) + claim_seconds, 3)
+    return report
+
+
+def merge_reports(reports):
+    """Combine the reports of several pipeline runs."""
+    counts, stage_seconds = Counter(), Counter()
+    for report in reports:
+        counts.update(report.counts)
+        stage_seconds.update(report.stage_seconds)
+    return PipelineReport(
+        items=[item for report in reports for item in report.items],
+        counts=counts,
+        stage_seconds={name: round(seconds, 3) for name, seconds in stage_seconds.items()},
+        elapsed=round(sum(report.elapsed for report in reports), 3)
+    )
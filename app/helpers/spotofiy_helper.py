@@ -1,16 +1,33 @@
 import spotipy
 from spotipy.oauth2 import SpotifyClientCredentials
-from app.helpers.jackett_helper import JackettHelper  # Corrected absolute import
-from app.helpers.qbittorrent_helper import QBittorrentHelper  # Corrected absolute import
+from app.helpers.registry import registry
+from app.helpers.http_sessions import sessions
+from app.helpers.library_index import normalize_title
+from app.helpers.ttl_cache import TTLCache
+from app.models import db, SpotifyLookup
+from datetime import datetime, timedelta
 import logging
 from config import Config
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 
-# Load configuration details for helper classes
-jackett_helper = JackettHelper()
-qb_helper = QBittorrentHelper()
+SEARCH_TYPES = ('track', 'album', 'artist')
+# Most IDs Spotify accepts per call on each multi-ID endpoint
+BATCH_LIMITS = {'track': 50, 'album': 20, 'artist': 50}
+# Titles Spotify had no match for are searched again sooner than resolved ones
+NEGATIVE_LOOKUP_MAX_AGE = timedelta(days=1)
+MISSING = object()
+
+# Helpers are created on first use by the registry
+jackett_helper = registry.proxy('jackett')
+qb_helper = registry.proxy('qbittorrent')
+
+
+def lookup_key(title):
+    """Return the cache key for a title: its normalized form, or the trimmed lowercase title if that is empty."""
+    return normalize_title(title) or (title or '').strip().casefold()
+
 
 class SpotifyHelper:
     def __init__(self):
@@ -23,32 +40,195 @@ class SpotifyHelper:
             raise ValueError("Spotify configuration is missing 'client_id' or 'client_secret'.")
 
         # Initialize Spotipy with the credentials
-        self.spotify = spotipy.Spotify(auth_manager=SpotifyClientCredentials(client_id=self.client_id, client_secret=self.client_secret))
+        session = sessions.proxy('spotify')
+        self.spotify = spotipy.Spotify(
+            auth_manager=SpotifyClientCredentials(client_id=self.client_id, client_secret=self.client_secret, requests_session=session),
+            requests_session=session
+        )
+        self.search_cache = TTLCache(config.SPOTIFY_CACHE_TTL)
+        self.lookup_max_age = timedelta(days=config.SPOTIFY_LOOKUP_MAX_AGE_DAYS)
 
     def is_music(self, title):
         """Check if the given title exists as music in Spotify."""
-        try:
-            results = self.spotify.search(q=title, type='track,album,artist', limit=1)
-            return len(results['tracks']['items']) > 0 or len(results['albums']['items']) > 0 or len(results['artists']['items']) > 0
-        except Exception as e:
-            logging.error(f"Error checking music for title '{title}': {e}")
-            return False
+        return self.search(title) is not None
 
     def get_metadata(self, title):
         """Retrieve metadata for the given title from Spotify."""
+        match = self.search(title)
+        return match['item'] if match else None
+
+    def search(self, title):
+        """
+        Resolve a title to its best Spotify match (first track, else album, else artist).
+
+        Results are looked up in the in-memory cache, then in the persisted lookups, and
+        only then searched on Spotify. Failed searches are not cached.
+
+        Returns:
+            dict: Match with 'type', 'id', 'item' and 'enriched' keys, or None if nothing matched.
+        """
+        key = lookup_key(title)
+        match = self.search_cache.get(key, MISSING)
+        if match is not MISSING:
+            return match
+
+        stored = self._load_lookups([key])
+        if key in stored:
+            self.search_cache.set(key, stored[key])
+            return stored[key]
+
+        match = self._search_spotify(title)
+        if match is MISSING:
+            return None
+        self._save_lookups({key: match})
+        self.search_cache.set(key, match)
+        return match
+
+    def get_metadata_batch(self, titles):
+        """
+        Resolve many titles and return full Spotify objects for them.
+
+        Titles that are not cached or persisted are searched one by one (Spotify has no
+        multi-title search). Matches are then expanded to full objects with the multi-ID
+        endpoints in batches of up to BATCH_LIMITS IDs; already expanded matches are reused.
+
+        Args:
+            titles (iterable): Titles to resolve.
+
+        Returns:
+            dict: Title -> Spotify object, or None if the title did not match.
+        """
+        titles = list(dict.fromkeys(titles))
+        keys = {title: lookup_key(title) for title in titles}
+        matches = {}
+        for key in set(keys.values()):
+            match = self.search_cache.get(key, MISSING)
+            if match is not MISSING:
+                matches[key] = match
+
+        matches.update(self._load_lookups([key for key in set(keys.values()) if key not in matches]))
+
+        searched = {}
+        for title, key in keys.items():
+            if key in matches or key in searched:
+                continue
+            match = self._search_spotify(title)
+            if match is not MISSING:
+                searched[key] = match
+        matches.update(searched)
+
+        enriched = self._enrich(matches)
+        self._save_lookups({**searched, **enriched})
+        for key, match in matches.items():
+            self.search_cache.set(key, match)
+
+        results = {}
+        for title, key in keys.items():
+            match = matches.get(key)
+            results[title] = match['item'] if match else None
+        return results
+
+    def enrich_requests(self, requests):
+        """
+        Fetch Spotify metadata for music requests in bulk.
+
+        Args:
+            requests (list): Request rows.
+
+        Returns:
+            dict: Request ID -> Spotify object, or None if the title did not match.
+        """
+        metadata = self.get_metadata_batch(request.title for request in requests)
+        return {request.id: metadata.get(request.title) for request in requests}
+
+    def _search_spotify(self, title):
+        """Search Spotify for a title; returns MISSING if the call failed."""
         try:
-            results = self.spotify.search(q=title, type='track,album,artist', limit=1)
-            if results['tracks']['items']:
-                return results['tracks']['items'][0]
-            elif results['albums']['items']:
-                return results['albums']['items'][0]
-            elif results['artists']['items']:
-                return results['artists']['items'][0]
-            else:
-                return None
+            results = self.spotify.search(q=title, type=','.join(SEARCH_TYPES), limit=1)
         except Exception as e:
-            logging.error(f"Error retrieving metadata for '{title}': {e}")
-            return None
+            logging.error(f"Error searching Spotify for '{title}': {e}")
+            return MISSING
+        for search_type in SEARCH_TYPES:
+            items = results.get(f"{search_type}s", {}).get('items') or []
+            if items:
+                return {'type': search_type, 'id': items[0]['id'], 'item': items[0], 'enriched': False}
+        return None
+
+    def _enrich(self, matches):
+        """
+        Replace search results in ``matches`` with full objects from the multi-ID endpoints.
+
+        Returns:
+            dict: The matches that were expanded, keyed like ``matches``.
+        """
+        endpoints = {'track': self.spotify.tracks, 'album': self.spotify.albums, 'artist': self.spotify.artists}
+        pending = {search_type: {} for search_type in SEARCH_TYPES}
+        for key, match in matches.items():
+            if match and not match['enriched']:
+                pending[match['type']].setdefault(match['id'], []).append(key)
+
+        enriched = {}
+        for search_type, keys_by_id in pending.items():
+            ids = list(keys_by_id)
+            limit = BATCH_LIMITS[search_type]
+            for start in range(0, len(ids), limit):
+                chunk = ids[start:start + limit]
+                try:
+                    items = endpoints[search_type](chunk)[f"{search_type}s"]
+                except Exception as e:
+                    logging.error(f"Error fetching {len(chunk)} Spotify {search_type}s: {e}")
+                    continue
+                for item in items:
+                    if not item:
+                        continue
+                    for key in keys_by_id.get(item['id'], []):
+                        matches[key] = enriched[key] = {
+                            'type': search_type, 'id': item['id'], 'item': item, 'enriched': True
+                        }
+        return enriched
+
+    def _load_lookups(self, keys):
+        """Return persisted matches that are still fresh, keyed by lookup key."""
+        if not keys:
+            return {}
+        now = datetime.utcnow()
+        found = {}
+        try:
+            rows = SpotifyLookup.query.filter(SpotifyLookup.query_key.in_(keys)).all()
+        except Exception as e:
+            logging.error(f"Error loading Spotify lookups: {e}")
+            return {}
+        for row in rows:
+            max_age = self.lookup_max_age if row.spotify_id else NEGATIVE_LOOKUP_MAX_AGE
+            if not row.resolved_at or now - row.resolved_at > max_age:
+                continue
+            found[row.query_key] = {
+                'type': row.spotify_type, 'id': row.spotify_id, 'item': row.payload, 'enriched': bool(row.enriched)
+            } if row.spotify_id else None
+        return found
+
+    def _save_lookups(self, matches):
+        """Persist resolved matches so later runs do not search Spotify again."""
+        if not matches:
+            return
+        now = datetime.utcnow()
+        rows = [
+            {
+                'query_key': key,
+                'spotify_type': match['type'] if match else None,
+                'spotify_id': match['id'] if match else None,
+                'payload': match['item'] if match else None,
+                'enriched': match['enriched'] if match else False,
+                'resolved_at': now
+            }
+            for key, match in matches.items()
+        ]
+        try:
+            SpotifyLookup.bulk_upsert(rows, keys=('query_key',))
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logging.error(f"Error saving Spotify lookups: {e}")
 
 # Function to download music using Jackett and qBittorrent
 def download_music(title):
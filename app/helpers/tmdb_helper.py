@@ -1,7 +1,11 @@
+import asyncio
+import aiohttp
 import requests
 import logging
 import re
 from config import Config
+from app.helpers.async_engine import engine
+from app.helpers.http_sessions import sessions
 from app import db  # Make sure to import your database instance
 from app.models import Recommendation, PastRecommendation  # Import your SQLAlchemy model for recommendations
 from datetime import datetime, timedelta
@@ -17,11 +21,18 @@ class TMDbHelper:
             if not self.api_key:
                 raise ValueError("TMDb API key not found in the configuration.")
             self.base_url = 'https://api.themoviedb.org/3'
-            self.image_base_url = self._get_image_base_url()
+            self._image_base_url = None
         except Exception as e:
             logging.error(f"Error initializing TMDbHelper: {e}")
             raise
 
+    @property
+    def image_base_url(self):
+        """Image base URL from TMDb's /configuration, fetched on first use."""
+        if self._image_base_url is None:
+            self._image_base_url = self._get_image_base_url()
+        return self._image_base_url
+
     def _get_image_base_url(self):
         """Fetch the base URL for images from TMDb configuration."""
         config_url = f"{self.base_url}/configuration"
@@ -36,7 +47,7 @@ class TMDbHelper:
     def _make_request(self, url, params):
         """Helper method to make HTTP requests and handle errors."""
         try:
-            response = requests.get(url, params=params, timeout=10)
+            response = sessions.get('tmdb').get(url, params=params, timeout=10)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.Timeout:
@@ -46,6 +57,26 @@ class TMDbHelper:
             logging.error(f"HTTP request error for {url}: {e}")
             return None
 
+    async def _make_request_async(self, url, params):
+        """
+        Async counterpart of _make_request, run on the shared async engine.
+
+        Unlike _make_request, errors are raised rather than returned as None, so the
+        pipeline can tell a TMDb outage from a search that found nothing.
+
+        Raises:
+            aiohttp.ClientError: On connection errors and non-2xx responses.
+            asyncio.TimeoutError: If TMDb does not answer in time.
+        """
+        try:
+            return await engine.get_json(url, params=params, timeout=10)
+        except asyncio.TimeoutError:
+            logging.error(f"Request to {url} timed out.")
+            raise
+        except aiohttp.ClientError as e:
+            logging.error(f"HTTP request error for {url}: {e}")
+            raise
+
     def generate_tmdb_url(self, media_type, tmdb_id, title):
         """Generate a TMDb URL based on media type, ID, and title."""
         base_url = "https://www.themoviedb.org"
@@ -131,35 +162,45 @@ class TMDbHelper:
         logging.info(f"Found {len(recommendations)} new recommendations for '{title}'")
         return recommendations
 
-    def get_media_details(self, title, media_type):
-        """
-        Fetch detailed information for a specific movie or TV show by title.
-        """
-        logging.info(f"Fetching media details for '{title}' as {media_type}")
+    def _details_search(self, title, media_type):
+        """URL and parameters of the search used to look up a title's details."""
         media_path = 'movie' if media_type.lower() == 'movie' else 'tv'
-        search_url = f"{self.base_url}/search/{media_path}"
         params = {
             "api_key": self.api_key,
             "query": title,
             "include_adult": "false",
             "language": "en-US,en-GB"
         }
-        search_response = self._make_request(search_url, params)
+        return f"{self.base_url}/search/{media_path}", params
 
+    @staticmethod
+    def _first_result(title, search_response):
         if not search_response or not search_response.get("results"):
             logging.warning(f"No details found for '{title}'")
             return None
 
         # Assuming the first result is the most relevant match
         return search_response["results"][0]
-    
+
+    def get_media_details(self, title, media_type):
+        """
+        Fetch detailed information for a specific movie or TV show by title.
+        """
+        logging.info(f"Fetching media details for '{title}' as {media_type}")
+        return self._first_result(title, self._make_request(*self._details_search(title, media_type)))
+
+    async def get_media_details_async(self, title, media_type):
+        """Async counterpart of get_media_details; raises if TMDb cannot be reached (see _make_request_async)."""
+        logging.info(f"Fetching media details for '{title}' as {media_type}")
+        return self._first_result(title, await self._make_request_async(*self._details_search(title, media_type)))
+
     def get_upcoming_movies(self, region="US"):
         today = datetime.now().strftime("%Y-%m-%d")
         three_months_later = (datetime.now() + timedelta(days=90)).strftime("%Y-%m-%d")
         
         # Add the region parameter to the request URL
         url = f"{self.base_url}/movie/upcoming?api_key={self.api_key}&language=en-US&region={region}"
-        response = requests.get(url)
+        response = sessions.get('tmdb').get(url, timeout=10)
         response.raise_for_status()
 
         results = response.json().get('results', [])
@@ -0,0 +1,50 @@
+import threading
+import time
+
+
+class TTLCache:
+    """Thread-safe in-memory cache whose entries expire ``ttl`` seconds after they are set."""
+
+    def __init__(self, ttl, max_size=10000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def get(self, key, default=None):
+        """Return the cached value for ``key``, or ``default`` if it is missing or expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+        expires_at, value = entry
+        if time.monotonic() >= expires_at:
+            with self._lock:
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+            return default
+        return value
+
+    def set(self, key, value, ttl=None):
+        """Cache ``value`` under ``key`` for ``ttl`` seconds (defaults to the cache TTL)."""
+        with self._lock:
+            if key not in self._entries and len(self._entries) >= self.max_size:
+                self._evict()
+            self._entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+
+    def pop(self, key):
+        """Remove ``key`` from the cache."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Remove every entry."""
+        with self._lock:
+            self._entries.clear()
+
+    def _evict(self):
+        """Drop expired entries, then the oldest ones, until there is room. Call with the lock held."""
+        now = time.monotonic()
+        for key in [key for key, (expires_at, _) in self._entries.items() if expires_at <= now]:
+            del self._entries[key]
+        while len(self._entries) >= self.max_size:
+            del self._entries[next(iter(self._entries))]
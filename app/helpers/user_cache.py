@@ -0,0 +1,95 @@
+import logging
+import threading
+import time
+from datetime import datetime
+from sqlalchemy import event, update, bindparam
+from sqlalchemy.orm import make_transient_to_detached
+from app.models import db, User
+from app.helpers.ttl_cache import TTLCache
+
+logging.basicConfig(level=logging.INFO)
+
+# Seconds a loaded user is served from memory; bounds how stale another process's copy can be
+USER_CACHE_TTL = 60
+# Seconds between batched writes of users' last_activity
+ACTIVITY_FLUSH_INTERVAL = 60
+
+
+class UserCache:
+    """
+    Process-local cache of users for Flask-Login's user_loader.
+
+    A cached user is a detached snapshot of its columns; load() attaches a copy to the
+    request's session with merge(load=False), so authenticated requests (AJAX calls,
+    download page polls) cost no query until the snapshot expires. Any ORM update or
+    delete of a User in this process drops its snapshot (see the mapper events below),
+    so profile, role and status changes are seen on the next request.
+
+    Activity is recorded in memory and written to users.last_activity in one
+    executemany every ACTIVITY_FLUSH_INTERVAL seconds rather than once per request.
+    """
+
+    def __init__(self, ttl=USER_CACHE_TTL, flush_interval=ACTIVITY_FLUSH_INTERVAL):
+        self._users = TTLCache(ttl)
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._activity = {}
+        self._flushed_at = time.monotonic()
+
+    def load(self, user_id):
+        """Return the user attached to the current session, or None if there is no such user."""
+        cached = self._users.get(user_id)
+        if cached is not None:
+            user = db.session.merge(cached, load=False)
+        else:
+            user = db.session.get(User, user_id)
+            if user is None:
+                return None
+            self._users.set(user_id, self._snapshot(user))
+        self.touch(user_id)
+        return user
+
+    @staticmethod
+    def _snapshot(user):
+        """Copy the user's column values into a detached instance that merge(load=False) can attach."""
+        snapshot = User(**{column.key: getattr(user, column.key) for column in User.__mapper__.column_attrs})
+        make_transient_to_detached(snapshot)
+        return snapshot
+
+    def invalidate(self, user_id):
+        self._users.pop(user_id)
+
+    def touch(self, user_id):
+        """Record activity for ``user_id``, flushing the batch if it is due."""
+        with self._lock:
+            self._activity[user_id] = datetime.utcnow()
+            due = time.monotonic() - self._flushed_at >= self.flush_interval
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Write pending last_activity values in their own transaction. Failures are logged and the batch dropped."""
+        with self._lock:
+            activity, self._activity = self._activity, {}
+            self._flushed_at = time.monotonic()
+        if not activity:
+            return
+        table = User.__table__
+        statement = update(table).where(table.c.id == bindparam('user_id')).values(last_activity=bindparam('seen_at'))
+        try:
+            with db.engine.begin() as connection:
+                connection.execute(statement, [
+                    {'user_id': user_id, 'seen_at': seen_at} for user_id, seen_at in activity.items()
+                ])
+        except Exception as e:
+            logging.error(f"Error saving last activity for {len(activity)} users: {e}")
+
+
+# Shared per-process cache used by the app's user_loader
+user_cache = UserCache()
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _invalidate_user(mapper, connection, target):
+    user_cache.invalidate(target.id)
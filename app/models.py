@@ -1,5 +1,81 @@
 from app.extensions import db
 from flask_login import UserMixin
+from collections import namedtuple
+from datetime import datetime, timedelta
+from sqlalchemy import insert, update, select, tuple_, or_, and_, bindparam, literal, func
+from sqlalchemy.orm import aliased
+
+BulkResult = namedtuple('BulkResult', ['inserted', 'updated', 'unchanged'])
+
+
+class BulkUpsertMixin:
+    """Set-based ingestion for models that are imported in bulk (media, requests, recommendations)."""
+
+    @classmethod
+    def bulk_upsert(cls, rows, keys, batch_size=500, update_existing=True):
+        """
+        Insert or update many rows identified by ``keys``.
+
+        Each batch costs one IN query to load the existing keys, one executemany INSERT
+        for new rows and one bulk UPDATE by primary key for changed rows. Rows repeated
+        within a batch are merged (last one wins). The caller owns the transaction.
+
+        Args:
+            rows (iterable): Dictionaries of column values; each must contain every key column.
+            keys (tuple): Column names that identify a row (e.g., ('jellyfin_id',)).
+            batch_size (int): Number of rows per lookup/write batch.
+            update_existing (bool): Update changed columns of existing rows instead of leaving them untouched.
+
+        Returns:
+            BulkResult: Counts of inserted, updated and unchanged rows.
+        """
+        totals = [0, 0, 0]
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                cls._upsert_batch(batch, keys, update_existing, totals)
+                batch = []
+        if batch:
+            cls._upsert_batch(batch, keys, update_existing, totals)
+        return BulkResult(*totals)
+
+    @classmethod
+    def _upsert_batch(cls, batch, keys, update_existing, totals):
+        """Write one batch for bulk_upsert and add its counts to ``totals``."""
+        rows_by_key = {tuple(row[key] for key in keys): row for row in batch}
+        columns = sorted({column for row in rows_by_key.values() for column in row})
+        key_columns = [getattr(cls, key) for key in keys]
+
+        if len(keys) == 1:
+            lookup = key_columns[0].in_([key[0] for key in rows_by_key])
+        else:
+            lookup = tuple_(*key_columns).in_(list(rows_by_key))
+        existing = {
+            tuple(getattr(found, key) for key in keys): found
+            for found in db.session.execute(
+                select(cls.id, *[getattr(cls, column) for column in columns]).where(lookup)
+            )
+        }
+
+        new_rows, changed_rows = [], []
+        for key, row in rows_by_key.items():
+            found = existing.get(key)
+            if found is None:
+                new_rows.append(row)
+                continue
+            changes = {column: value for column, value in row.items() if getattr(found, column) != value}
+            if changes and update_existing:
+                changed_rows.append({'id': found.id, **changes})
+            else:
+                totals[2] += 1
+
+        if new_rows:
+            db.session.execute(insert(cls), new_rows)
+            totals[0] += len(new_rows)
+        if changed_rows:
+            db.session.execute(update(cls), changed_rows)
+            totals[1] += len(changed_rows)
 
 class User(UserMixin, db.Model):
     __tablename__ = 'users'
@@ -21,20 +97,163 @@ class User(UserMixin, db.Model):
     recommendations = db.relationship('Recommendation', back_populates='user', cascade='all, delete-orphan')
 
 
-class Request(db.Model):
+class Request(BulkUpsertMixin, db.Model):
     __tablename__ = 'requests'
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)  # Requests ingested from email have no user
     media_type = db.Column(db.Enum('Movie', 'TV Show', 'Music'), nullable=False)
     title = db.Column(db.String(255), nullable=False)
-    status = db.Column(db.Enum('Pending', 'In Progress', 'Completed', 'Failed'), default='Pending')
+    status = db.Column(db.Enum('Pending', 'Waiting', 'In Progress', 'Completed', 'Failed'), default='Pending')
     priority = db.Column(db.Enum('Low', 'Medium', 'High'), default='Medium')
     requested_at = db.Column(db.TIMESTAMP, server_default=db.func.now())
     last_status_update = db.Column(db.TIMESTAMP, onupdate=db.func.now())
+    lease_owner = db.Column(db.String(128))  # Pipeline worker currently processing the request
+    lease_expires_at = db.Column(db.TIMESTAMP)  # After this the request can be claimed by another worker
+    attempts = db.Column(db.Integer, nullable=False, default=0)  # Pipeline runs that failed to start a download
+    last_error = db.Column(db.String(255))
+    next_attempt_at = db.Column(db.TIMESTAMP)  # Not claimed again before this; NULL means due now
 
     # Relationships
     user = db.relationship('User', back_populates='requests')
 
+    __table_args__ = (
+        db.Index('ix_requests_status_next_attempt', 'status', 'next_attempt_at'),
+        db.Index('ix_requests_status_requested_at', 'status', 'requested_at'),
+        db.Index('ix_requests_requested_at', 'requested_at'),
+        db.Index('ix_requests_title_media_type', 'title', 'media_type'),
+    )
+
+    # Statuses the pipeline picks up once next_attempt_at is due
+    CLAIMABLE_STATUSES = ('Pending', 'Waiting')
+
+    @classmethod
+    def claim_pending(cls, owner, limit=100, lease_seconds=600, exclude_ids=()):
+        """
+        Atomically lease up to ``limit`` due requests to ``owner``.
+
+        Pending and Waiting requests whose next_attempt_at has passed (or is unset) and
+        that have no lease, or an expired one, are claimable, so work left behind by a
+        crashed worker is picked up once its lease runs out. MySQL and PostgreSQL lock
+        the candidate rows with SELECT ... FOR UPDATE SKIP LOCKED, so concurrent workers
+        claim disjoint batches without waiting on each other; SQLite, which serializes
+        writers, uses a single conditional UPDATE ... RETURNING over a LIMITed subquery.
+        Leases held past lease_seconds must be extended with renew_leases. Commits.
+
+        Args:
+            owner (str): Unique lease owner for this claim.
+            limit (int): Maximum number of requests to claim.
+            lease_seconds (int): How long the lease lasts.
+            exclude_ids (iterable): Request IDs not to claim (e.g. already handled in this run).
+
+        Returns:
+            list: The Request rows leased by this call.
+        """
+        now = datetime.utcnow().replace(microsecond=0)
+        claimable = [
+            cls.status.in_(cls.CLAIMABLE_STATUSES),
+            or_(cls.next_attempt_at.is_(None), cls.next_attempt_at <= now),
+            or_(cls.lease_expires_at.is_(None), cls.lease_expires_at < now)
+        ]
+        if exclude_ids:
+            claimable.append(cls.id.notin_(list(exclude_ids)))
+        candidates = select(cls.id).where(*claimable).order_by(cls.id).limit(limit)
+        lease = {
+            'lease_owner': owner,
+            'lease_expires_at': now + timedelta(seconds=lease_seconds),
+            'last_status_update': cls.last_status_update  # A lease is not a status change
+        }
+
+        # Only the rows leased by this call are returned, never ones ``owner`` still holds from an earlier claim
+        dialect = db.session.get_bind().dialect
+        if dialect.name in ('mysql', 'mariadb', 'postgresql'):
+            ids = db.session.execute(candidates.with_for_update(skip_locked=True)).scalars().all()
+            if ids:
+                db.session.execute(
+                    update(cls).where(cls.id.in_(ids)).values(**lease).execution_options(synchronize_session=False)
+                )
+        elif dialect.update_returning:
+            ids = db.session.execute(
+                update(cls).where(cls.id.in_(candidates.scalar_subquery()), *claimable).values(**lease)
+                .returning(cls.id).execution_options(synchronize_session=False)
+            ).scalars().all()
+        else:
+            # The UPDATE re-checks the claim conditions, so rows another worker took meanwhile are skipped
+            ids = db.session.execute(candidates).scalars().all()
+            if ids:
+                db.session.execute(
+                    update(cls).where(cls.id.in_(ids), *claimable).values(**lease)
+                    .execution_options(synchronize_session=False)
+                )
+        db.session.commit()
+        if not ids:
+            return []
+        return cls.query.filter(cls.id.in_(ids), cls.lease_owner == owner).order_by(cls.id).all()
+
+    @classmethod
+    def renew_leases(cls, ids, owner, lease_seconds):
+        """Extend ``owner``'s leases on ``ids`` to ``lease_seconds`` from now, so a long run is not reclaimed. Commits."""
+        if not ids:
+            return 0
+        result = db.session.execute(
+            update(cls).where(cls.id.in_(list(ids)), cls.lease_owner == owner)
+            .values(
+                lease_expires_at=datetime.utcnow().replace(microsecond=0) + timedelta(seconds=lease_seconds),
+                last_status_update=cls.last_status_update
+            )
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return result.rowcount
+
+    @classmethod
+    def release(cls, ids, owner, **values):
+        """Clear ``owner``'s lease on ``ids``, applying ``values`` (e.g. a new status) at the same time. Commits."""
+        if not ids:
+            return 0
+        if 'status' not in values:
+            values['last_status_update'] = cls.last_status_update
+        result = db.session.execute(
+            update(cls).where(cls.id.in_(list(ids)), cls.lease_owner == owner)
+            .values(lease_owner=None, lease_expires_at=None, **values)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return result.rowcount
+
+    @classmethod
+    def release_failed(cls, owner, failures):
+        """
+        Clear ``owner``'s leases and record a failed attempt on each request, in one executemany. Commits.
+
+        Args:
+            owner (str): Lease owner.
+            failures (list): Dicts with 'id', 'status', 'attempts', 'last_error' and 'next_attempt_at'.
+        """
+        if not failures:
+            return
+        table = cls.__table__
+        statement = update(table).where(
+            table.c.id == bindparam('failed_id'), table.c.lease_owner == owner
+        ).values(
+            status=bindparam('new_status'),
+            attempts=bindparam('new_attempts'),
+            last_error=bindparam('new_last_error'),
+            next_attempt_at=bindparam('new_next_attempt_at'),
+            lease_owner=None,
+            lease_expires_at=None
+        )
+        db.session.execute(statement, [
+            {
+                'failed_id': failure['id'],
+                'new_status': failure['status'],
+                'new_attempts': failure['attempts'],
+                'new_last_error': (failure['last_error'] or '')[:255],
+                'new_next_attempt_at': failure['next_attempt_at']
+            }
+            for failure in failures
+        ])
+        db.session.commit()
+
 
 class Download(db.Model):
     __tablename__ = 'downloads'
@@ -51,7 +270,7 @@ class Download(db.Model):
     user = db.relationship('User', back_populates='downloads')
 
 
-class Recommendation(db.Model):
+class Recommendation(BulkUpsertMixin, db.Model):
     __tablename__ = 'recommendations'
     id = db.Column(db.Integer, primary_key=True)
     media_title = db.Column(db.String(255), nullable=False)
@@ -67,6 +286,67 @@ class Recommendation(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     user = db.relationship('User', back_populates='recommendations')
 
+    __table_args__ = (
+        db.Index('ix_recommendations_media_related', 'media_title', 'related_media_title'),
+    )
+
+    @classmethod
+    def add_requests(cls, ids, user_id):
+        """
+        Request the recommended titles of ``ids`` for ``user_id`` in one INSERT ... SELECT.
+
+        Titles the user has already requested are skipped in the same statement (NOT
+        EXISTS). Duplicates within the selection are grouped on the title, the same key
+        as that check, so a title recommended as both a movie and a show yields one
+        request. No unique constraint backs this up (the model and migrations declare
+        none), so the NOT EXISTS guard is the only deduplication. The caller owns the
+        transaction.
+
+        Returns:
+            int: Number of requests created.
+        """
+        if not ids:
+            return 0
+        existing = aliased(Request)
+        candidates = select(
+            literal(user_id), func.min(cls.media_type), cls.related_media_title,
+            literal('Pending'), literal('Medium'), literal(0)
+        ).where(
+            cls.id.in_(list(ids)),
+            cls.media_type.in_(Request.media_type.type.enums),
+            ~select(existing.id).where(
+                existing.user_id == user_id, existing.title == cls.related_media_title
+            ).exists()
+        ).group_by(cls.related_media_title)
+        result = db.session.execute(
+            insert(Request).from_select(
+                ['user_id', 'media_type', 'title', 'status', 'priority', 'attempts'], candidates
+            )
+        )
+        return result.rowcount
+
+    @classmethod
+    def ignore(cls, ids, user_id):
+        """
+        Ignore the recommendations ``ids`` for ``user_id`` in one INSERT ... SELECT, skipping ones already ignored.
+
+        Returns:
+            int: Number of recommendations newly ignored.
+        """
+        if not ids:
+            return 0
+        candidates = select(cls.id, literal(user_id)).where(
+            cls.id.in_(list(ids)),
+            ~select(IgnoredRecommendation.id).where(
+                IgnoredRecommendation.recommendation_id == cls.id,
+                IgnoredRecommendation.user_id == user_id
+            ).exists()
+        )
+        result = db.session.execute(
+            insert(IgnoredRecommendation).from_select(['recommendation_id', 'user_id'], candidates)
+        )
+        return result.rowcount
+
 
 class PastRecommendation(db.Model):
     __tablename__ = 'past_recommendations'
@@ -76,8 +356,12 @@ class PastRecommendation(db.Model):
     sent_to_email = db.Column(db.String(120))
     sent_at = db.Column(db.TIMESTAMP, server_default=db.func.now())
 
+    __table_args__ = (
+        db.Index('ix_past_recommendations_media_related', 'media_title', 'related_media_title'),
+    )
 
-class Media(db.Model):
+
+class Media(BulkUpsertMixin, db.Model):
     __tablename__ = 'media'
     id = db.Column(db.Integer, primary_key=True)
     media_type = db.Column(db.Enum('Movie', 'TV Show', 'Music'), nullable=False)
@@ -87,6 +371,49 @@ class Media(db.Model):
     description = db.Column(db.Text)
     path = db.Column(db.String(255))
     status = db.Column(db.Enum('Available', 'Unavailable'), default='Available')
+    jellyfin_id = db.Column(db.String(64), unique=True)  # Jellyfin item ID, used to upsert on sync
+    last_seen_sync = db.Column(db.String(32))  # Token of the last full Jellyfin sync that returned the item
+
+    __table_args__ = (
+        db.Index('ix_media_title_media_type', 'title', 'media_type'),
+        db.Index('ix_media_library_page', 'media_type', 'status', 'title', 'id'),
+    )
+
+    # Columns shown in library lists; description is only loaded for detail views
+    LIST_COLUMNS = ('id', 'title', 'media_type', 'release_date')
+
+    @classmethod
+    def library_page(cls, media_type, after=None, limit=50):
+        """
+        Return one page of available media of ``media_type``, ordered by (title, id).
+
+        Keyset pagination: the page starts after the (title, id) of the previous page's
+        last row, so every page is an index range scan on ix_media_library_page no matter
+        how deep it is, and rows added or removed meanwhile never shift later pages.
+
+        Args:
+            media_type (str): 'Movie', 'TV Show' or 'Music'.
+            after (tuple): (title, id) of the last row of the previous page, or None.
+            limit (int): Rows per page.
+
+        Returns:
+            tuple: (rows, has_more); rows are named tuples of LIST_COLUMNS.
+        """
+        statement = select(*[getattr(cls, column) for column in cls.LIST_COLUMNS]).where(
+            cls.media_type == media_type, cls.status == 'Available'
+        )
+        if after is not None:
+            title, last_id = after
+            statement = statement.where(or_(cls.title > title, and_(cls.title == title, cls.id > last_id)))
+        rows = db.session.execute(statement.order_by(cls.title, cls.id).limit(limit + 1)).all()
+        return rows[:limit], len(rows) > limit
+
+
+class SyncState(db.Model):
+    __tablename__ = 'sync_state'
+    name = db.Column(db.String(64), primary_key=True)
+    cursor = db.Column(db.Text)  # Watermark or delta token from the last successful sync
+    last_synced_at = db.Column(db.TIMESTAMP)
 
 
 class IgnoredRecommendation(db.Model):
@@ -95,3 +422,50 @@ class IgnoredRecommendation(db.Model):
     recommendation_id = db.Column(db.Integer, db.ForeignKey('recommendations.id'), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     ignored_at = db.Column(db.TIMESTAMP, server_default=db.func.now())
+
+    __table_args__ = (
+        db.Index('ix_ignored_recommendations_recommendation_user', 'recommendation_id', 'user_id'),
+    )
+
+
+class ProcessedMessage(db.Model):
+    __tablename__ = 'processed_messages'
+    message_id = db.Column(db.String(255), primary_key=True)  # Microsoft Graph message ID
+    processed_at = db.Column(db.TIMESTAMP, server_default=db.func.now(), index=True)
+
+
+class SpotifyLookup(BulkUpsertMixin, db.Model):
+    __tablename__ = 'spotify_lookups'
+    id = db.Column(db.Integer, primary_key=True)
+    query_key = db.Column(db.String(255), unique=True, nullable=False)  # Normalized search title
+    spotify_type = db.Column(db.String(16))  # track, album or artist; NULL when the search found nothing
+    spotify_id = db.Column(db.String(64))
+    payload = db.Column(db.JSON)
+    enriched = db.Column(db.Boolean, default=False)  # Payload is the full object from a multi-ID endpoint
+    resolved_at = db.Column(db.TIMESTAMP, index=True)
+
+
+class SchedulerLease(db.Model):
+    __tablename__ = 'scheduler_leases'
+    name = db.Column(db.String(64), primary_key=True)
+    owner = db.Column(db.String(128))  # Process currently allowed to run the scheduled jobs
+    expires_at = db.Column(db.TIMESTAMP)
+
+
+class JobRun(db.Model):
+    __tablename__ = 'job_runs'
+    id = db.Column(db.Integer, primary_key=True)
+    job_name = db.Column(db.String(64), nullable=False)
+    owner = db.Column(db.String(128))  # host:pid that ran the job, to spot overlapping runs
+    started_at = db.Column(db.TIMESTAMP, nullable=False)
+    finished_at = db.Column(db.TIMESTAMP)
+    duration_seconds = db.Column(db.Float)
+    status = db.Column(db.Enum('Success', 'Failed'), nullable=False)
+    items = db.Column(db.Integer, default=0)  # Requests (or media items) the run handled
+    counts = db.Column(db.JSON)  # Outcome -> count
+    stage_seconds = db.Column(db.JSON)  # Stage -> busy seconds
+    error = db.Column(db.String(255))
+
+    __table_args__ = (
+        db.Index('ix_job_runs_job_started', 'job_name', 'started_at'),
+    )
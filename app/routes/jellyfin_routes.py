@@ -1,5 +1,7 @@
 from flask import Blueprint, jsonify, request
-from app.helpers.jellyfin_helper import JellyfinHelper
+from app.helpers.registry import registry
+from app.helpers.library_index import library_index
+import hmac
 import logging
 
 # Configure logging
@@ -8,20 +10,33 @@ logging.basicConfig(level=logging.INFO)
 # Create a Blueprint for Jellyfin routes
 jellyfin_bp = Blueprint('jellyfin_routes', __name__)
 
-# Initialize JellyfinHelper
-jellyfin_helper = JellyfinHelper()
+# JellyfinHelper is created on first use by the registry
+jellyfin_helper = registry.proxy('jellyfin')
 
 @jellyfin_bp.route('/sync-jellyfin', methods=['GET'])
 def sync_jellyfin():
-    """Route to sync Jellyfin media with the database."""
+    """Route to sync Jellyfin media with the database. Pass ?full=1 to force a full resync."""
+    full = request.args.get('full', '').lower() in ('1', 'true', 'yes')
     try:
-        jellyfin_helper.save_items_to_db()
-        return jsonify({"message": "Jellyfin media sync completed."}), 200
+        counts = jellyfin_helper.save_items_to_db(full=full)
+        return jsonify({"message": "Jellyfin media sync completed.", **counts}), 200
     except Exception as e:
         logging.error(f"Error during Jellyfin sync: {e}")
         return jsonify({"error": "Failed to sync Jellyfin media."}), 500
 
 
+@jellyfin_bp.route('/sync-jellyfin-music', methods=['GET'])
+def sync_jellyfin_music():
+    """Route to sync Jellyfin music artists and albums with the database. Pass ?full=1 to force a full resync."""
+    full = request.args.get('full', '').lower() in ('1', 'true', 'yes')
+    try:
+        counts = jellyfin_helper.save_music_to_db(full=full)
+        return jsonify({"message": "Jellyfin music sync completed.", **counts}), 200
+    except Exception as e:
+        logging.error(f"Error during Jellyfin music sync: {e}")
+        return jsonify({"error": "Failed to sync Jellyfin music."}), 500
+
+
 @jellyfin_bp.route('/check-library', methods=['GET'])
 def check_jellyfin_library():
     """Route to check if a title exists in the Jellyfin library."""
@@ -34,4 +49,37 @@ def check_jellyfin_library():
         logging.info(f"{title} exists in the Jellyfin library")
         return jsonify({'message': f"{title} exists in the Jellyfin library"}), 200
     logging.info(f"{title} not found in the Jellyfin library")
-    return jsonify({'message': f"{title} not found in the Jellyfin library"}), 404
+    suggestions = [
+        {'title': entry['title'], 'media_type': entry['media_type'], 'year': entry['year'], 'score': score}
+        for score, entry in library_index.fuzzy(title)
+    ]
+    return jsonify({'message': f"{title} not found in the Jellyfin library", 'suggestions': suggestions}), 404
+
+
+@jellyfin_bp.route('/jellyfin/webhook', methods=['POST'])
+def jellyfin_webhook():
+    """
+    Receive Jellyfin webhook plugin notifications (ItemAdded, ItemUpdated, ItemDeleted).
+
+    The route is CSRF-exempt, so every call must send the configured secret in the
+    X-Webhook-Token header; without a configured secret the webhook is disabled.
+    """
+    if not jellyfin_helper.webhook_secret:
+        logging.warning("Rejected Jellyfin webhook: no webhook_secret is configured")
+        return jsonify({'error': 'The Jellyfin webhook is disabled until Jellyfin.webhook_secret is set'}), 503
+    token = request.headers.get('X-Webhook-Token', '')
+    if not hmac.compare_digest(token.encode(), jellyfin_helper.webhook_secret.encode()):
+        logging.warning("Rejected Jellyfin webhook with an invalid token")
+        return jsonify({'error': 'Invalid webhook token'}), 401
+
+    payload = request.get_json(silent=True)
+    events = payload if isinstance(payload, list) else [payload]
+    if not payload or not all(isinstance(event, dict) for event in events):
+        return jsonify({'error': 'A JSON webhook payload is required'}), 400
+
+    try:
+        results = [jellyfin_helper.apply_webhook_event(event) for event in events]
+        return jsonify({'results': results}), 200
+    except Exception as e:
+        logging.error(f"Error applying Jellyfin webhook: {e}")
+        return jsonify({'error': 'Failed to apply Jellyfin webhook.'}), 500
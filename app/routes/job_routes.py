@@ -0,0 +1,49 @@
+from flask import Blueprint, jsonify, request
+from flask_login import login_required
+from app.models import JobRun
+from app.helpers.job_recorder import summarize_runs
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+
+# Create a Blueprint for scheduled job history
+job_bp = Blueprint('job_routes', __name__)
+
+@job_bp.route('/jobs/runs', methods=['GET'])
+@login_required
+def job_runs():
+    """
+    Recent runs of the scheduled jobs with duration and per-stage percentiles.
+
+    Query parameters: job (only this job), limit (runs listed per job, default 20) and
+    window (runs the percentiles are computed over, default 200).
+    """
+    limit = min(request.args.get('limit', 20, type=int), 500)
+    window = min(request.args.get('window', 200, type=int), 5000)
+    job_names = [request.args['job']] if request.args.get('job') else [
+        name for (name,) in JobRun.query.with_entities(JobRun.job_name).distinct()
+    ]
+
+    jobs = {}
+    for name in job_names:
+        runs = JobRun.query.filter_by(job_name=name).order_by(JobRun.started_at.desc()).limit(max(limit, window)).all()
+        jobs[name] = {
+            'summary': summarize_runs(runs[:window]),
+            'recent': [
+                {
+                    'id': run.id,
+                    'owner': run.owner,
+                    'started_at': run.started_at.isoformat() if run.started_at else None,
+                    'finished_at': run.finished_at.isoformat() if run.finished_at else None,
+                    'duration_seconds': run.duration_seconds,
+                    'status': run.status,
+                    'items': run.items,
+                    'counts': run.counts,
+                    'stage_seconds': run.stage_seconds,
+                    'error': run.error
+                }
+                for run in runs[:limit]
+            ]
+        }
+    return jsonify({"jobs": jobs}), 200
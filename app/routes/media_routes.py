@@ -1,10 +1,5 @@
 from flask import Blueprint, request, jsonify
-from app.helpers.qbittorrent_helper import QBittorrentHelper
-from app.helpers.jackett_helper import JackettHelper
-from app.helpers.jellyfin_helper import JellyfinHelper
-from app.helpers.tmdb_helper import TMDbHelper
-from app.helpers.spotify_helper import SpotifyHelper
-from config import Config
+from app.helpers.registry import registry
 import logging
 
 # Configure logging
@@ -13,15 +8,12 @@ logging.basicConfig(level=logging.INFO)
 # Create a Blueprint for media routes
 bp = Blueprint('media_routes', __name__)
 
-# Initialize configuration
-config = Config()
-
-# Initialize helper instances with appropriate configurations
-qb_helper = QBittorrentHelper(max_retries=3, retry_delay=5)
-jackett_helper = JackettHelper()
-jellyfin_helper = JellyfinHelper()
-tmdb_helper = TMDbHelper()
-spotify_helper = SpotifyHelper()
+# Helpers are created on first use by the registry
+qb_helper = registry.proxy('qbittorrent')
+jackett_helper = registry.proxy('jackett')
+jellyfin_helper = registry.proxy('jellyfin')
+tmdb_helper = registry.proxy('tmdb')
+spotify_helper = registry.proxy('spotify')
 
 @bp.route('/download', methods=['POST'])
 def download_media():
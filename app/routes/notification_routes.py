@@ -1,11 +1,5 @@
 from flask import Blueprint, jsonify, request
-from app.helpers.qbittorrent_helper import QBittorrentHelper
-from app.helpers.jackett_helper import JackettHelper
-from app.helpers.jellyfin_helper import JellyfinHelper
-from app.helpers.tmdb_helper import TMDbHelper
-from app.helpers.spotify_helper import SpotifyHelper
-from app.helpers.outlook_helper import OutlookHelper
-from config import Config
+from app.helpers.registry import registry
 import logging
 
 # Configure logging
@@ -14,13 +8,12 @@ logging.basicConfig(level=logging.INFO)
 # Create a Blueprint for the notification routes
 bp = Blueprint('notification_routes', __name__)
 
-# Instantiate helpers with configuration
-config = Config()
-qb_helper = QBittorrentHelper()
-jackett_helper = JackettHelper()
-jellyfin_helper = JellyfinHelper()
-spotify_helper = SpotifyHelper()
-outlook_helper = OutlookHelper()
+# Helpers are created on first use by the registry
+qb_helper = registry.proxy('qbittorrent')
+jackett_helper = registry.proxy('jackett')
+jellyfin_helper = registry.proxy('jellyfin')
+spotify_helper = registry.proxy('spotify')
+outlook_helper = registry.proxy('outlook')
 
 # Route to get notifications (placeholder for actual logic)
 @bp.route('/notifications', methods=['GET'])
@@ -37,12 +30,19 @@ def check_outlook_emails():
         logging.error("Failed to acquire Outlook access token")
         return jsonify({"error": "Failed to acquire access token"}), 500
 
-    emails = outlook_helper.get_filtered_emails(access_token)
+    emails, delta_link = outlook_helper.get_new_emails(access_token)
     if not emails:
+        outlook_helper.save_delta_link(delta_link)
         logging.info("No new emails found in Outlook")
         return jsonify({"message": "No new emails found"})
 
-    outlook_helper.process_requests(emails, access_token)
+    try:
+        outlook_helper.process_requests(emails, access_token)
+    except Exception as e:
+        # Keep the previous delta link so the next poll returns these emails again
+        logging.error(f"Error processing Outlook emails: {e}")
+        return jsonify({"error": "Failed to store requests from emails"}), 500
+    outlook_helper.save_delta_link(delta_link)
     logging.info("Outlook emails processed successfully")
     return jsonify({"message": "Processed Outlook emails successfully"})
 
@@ -161,8 +161,17 @@ def media_details():
         return jsonify({"error": "Title is required"}), 400
 
     try:
-        items = jellyfin_helper.get_existing_items()
-        matched_items = [item for item in items if item.get('Name').lower() == title.lower()]
+        matched_items = [
+            {
+                "Id": media.jellyfin_id,
+                "Name": media.title,
+                "Type": media.media_type,
+                "ProductionYear": media.release_date.year if media.release_date else None,
+                "Overview": media.description,
+                "Path": media.path
+            }
+            for media in jellyfin_helper.find_items(title)
+        ]
         if matched_items:
             logging.info(f"Details found for {title} in Jellyfin")
             return jsonify({"media_details": matched_items}), 200
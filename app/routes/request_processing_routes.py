@@ -1,8 +1,6 @@
 from flask import Blueprint, jsonify, current_app
-from app.models import Request, db
-from app.helpers.jackett_helper import JackettHelper
-from app.helpers.qbittorrent_helper import QBittorrentHelper
-from app.helpers.tmdb_helper import TMDbHelper
+from app.helpers.registry import registry
+from app.helpers.request_pipeline import process_pending_requests
 import logging
 
 # Configure logging
@@ -25,51 +23,7 @@ def process_requests():
 def process_requests_with_jackett_and_qbittorrent():
     """Check pending requests, validate titles with TMDb, and process them with Jackett and qBittorrent."""
     logging.info("Starting Jackett and qBittorrent request processing.")
-    jackett_helper = JackettHelper()
-    qb_helper = QBittorrentHelper()
-    tmdb_helper = TMDbHelper()
-
-    # Query for pending requests
-    pending_requests = Request.query.filter_by(status='Pending').all()
-    logging.info(f"Found {len(pending_requests)} pending requests.")
-
-    for request in pending_requests:
-        logging.info(f"Processing request: {request.title}, type: {request.media_type}")
-
-        # Validate the title with TMDb
-        validated_media = tmdb_helper.get_media_details(request.title, request.media_type.lower())
-        if not validated_media:
-            logging.warning(f"No valid TMDb data found for {request.title}, skipping...")
-            continue
-
-        validated_title = validated_media.get('title') if request.media_type == 'Movie' else validated_media.get('name')
-        release_year = validated_media.get('release_date', '')[:4]
-        logging.info(f"Validated title: {validated_title}, Year: {release_year}")
-
-        # Search for torrents on Jackett
-        search_query = f"{validated_title} {release_year}"
-        logging.info(f"Searching Jackett for: {search_query}")
-        magnet_link = jackett_helper.search_jackett(query=search_query, category=request.media_type)
-
-        if not magnet_link:
-            logging.warning(f"No torrents found for: {search_query}, skipping...")
-            continue
-
-        # Add the torrent to qBittorrent
-        try:
-            download_path = f"/downloads/{request.media_type}/{validated_title}"
-            qb_helper.add_torrent(magnet_link, save_path=download_path, rename=validated_title)
-
-            # Update request status
-            request.status = 'In Progress'
-            db.session.commit()
-            logging.info(f"Download started for: {validated_title}")
-        except Exception as e:
-            logging.error(f"Failed to start download for {validated_title}: {e}")
-            db.session.rollback()
-
-        else:
-            logging.info(f"No torrent found for validated title: {validated_title}")
+    return process_pending_requests()
 
 def process_pending_requests_task():
     """Scheduled task to process pending requests."""
@@ -83,9 +37,7 @@ def process_pending_requests_task():
 
 @request_processing_bp.route('/pause-download/<hash>', methods=['POST'])
 def pause_download(hash):
-    jackett_helper = JackettHelper()
-    qb_helper = QBittorrentHelper()
-    tmdb_helper = TMDbHelper()
+    qb_helper = registry.get('qbittorrent')
     try:
         qb_helper.pause_download(hash)
         return jsonify({"message": f"Download {hash} paused"}), 200
@@ -94,9 +46,7 @@ def pause_download(hash):
 
 @request_processing_bp.route('/resume-download/<hash>', methods=['POST'])
 def resume_download(hash):
-    jackett_helper = JackettHelper()
-    qb_helper = QBittorrentHelper()
-    tmdb_helper = TMDbHelper()
+    qb_helper = registry.get('qbittorrent')
     try:
         qb_helper.resume_download(hash)
         return jsonify({"message": f"Download {hash} resumed"}), 200
@@ -105,9 +55,7 @@ def resume_download(hash):
 
 @request_processing_bp.route('/remove-download/<hash>', methods=['POST'])
 def remove_download(hash):
-    jackett_helper = JackettHelper()
-    qb_helper = QBittorrentHelper()
-    tmdb_helper = TMDbHelper()
+    qb_helper = registry.get('qbittorrent')
     try:
         qb_helper.remove_download(hash)
         return jsonify({"message": f"Download {hash} removed"}), 200
@@ -1,17 +1,11 @@
 from flask import Blueprint, request, jsonify
 from app.models import db, Request
 from flask_login import login_required, current_user
-from app.helpers.qbittorrent_helper import QBittorrentHelper
-from app.helpers.tmdb_helper import TMDbHelper
-from app.helpers.jackett_helper import JackettHelper
-from config import Config
+from app.helpers.registry import registry
 import logging
 
 bp = Blueprint('request_routes', __name__)
 
-# Initialize the configuration
-config = Config()
-
 @bp.route('/create-request', methods=['POST'])
 @login_required
 def create_request():
@@ -23,7 +17,7 @@ def create_request():
         return jsonify({'error': 'Title and media type are required'}), 400
 
     # Check if the media exists using TMDb and classify it
-    tmdb_helper = TMDbHelper()
+    tmdb_helper = registry.get('tmdb')
     classification = tmdb_helper.classify_title(title)
     if not classification:
         return jsonify({'message': f"Failed to classify the title: {title}"}), 404
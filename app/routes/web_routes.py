@@ -2,10 +2,11 @@ from flask_wtf.csrf import validate_csrf, generate_csrf
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app
 from flask_login import login_required, current_user
 from app.models import Request, User, Download, Media, Recommendation, db, PastRecommendation, IgnoredRecommendation
-from app.helpers.jackett_helper import JackettHelper, normalize_media_type
-from app.helpers.qbittorrent_helper import QBittorrentHelper
-from app.helpers.tmdb_helper import TMDbHelper
-import re
+from app.helpers.http_sessions import sessions
+from app.helpers.pagination import encode_cursor, decode_cursor
+from app.helpers.registry import registry
+from app.helpers import recommendation_generator
+from app.helpers.request_pipeline import get_download_path, process_pending_requests
 from datetime import datetime
 from sqlalchemy.exc import SQLAlchemyError
 import hashlib
@@ -31,20 +32,9 @@ logging.basicConfig(
 
 bp = Blueprint('web_routes', __name__)
 
-def get_download_path(title, media_type):
-    """Determine the correct directory path for the torrent download."""
-    title_for_path = re.sub(r'^(The|A|An)\s+', '', title, flags=re.IGNORECASE).strip()
-    first_letter = title_for_path[0].upper() if title_for_path else 'Misc'
-    media_type = media_type.lower() if media_type else None
-
-    if media_type == 'movie':
-        return f"E:\\Movies\\{first_letter}\\"
-    elif media_type == 'tv show':
-        return f"E:\\Tv Shows\\{first_letter}\\"
-    elif media_type == 'music':
-        return f"E:\\Music\\{first_letter}\\"
-    else:
-        raise ValueError(f"Unsupported media type: {media_type}. Cannot determine download path.")
+LIBRARY_MEDIA_TYPES = ('Movie', 'TV Show', 'Music')
+LIBRARY_PAGE_SIZE = 50
+LIBRARY_MAX_PAGE_SIZE = 200
 
 @bp.route('/')
 @login_required
@@ -56,32 +46,73 @@ def home():
 def dashboard():
     return render_template('dashboard.html')
 
+@bp.route('/service-status')
+@login_required
+def service_status():
+    """
+    Report the health of each backend helper and how often its HTTP connections are reused.
+    Pass ?check=1 to try connecting the ones not yet started.
+    """
+    check = request.args.get('check', '').lower() in ('1', 'true', 'yes')
+    services = registry.status(check=check)
+    healthy = all(service['state'] != 'error' for service in services.values())
+    return jsonify({"healthy": healthy, "services": services, "http": sessions.stats()}), 200 if healthy else 503
+
 @bp.route('/downloads')
 @login_required
 def downloads():
     try:
-        qb_helper = QBittorrentHelper()
+        qb_helper = registry.get('qbittorrent')
         active_downloads = qb_helper.get_active_downloads()
         return render_template('downloads.html', downloads=active_downloads)
     except Exception as e:
         logging.error(f"Error fetching downloads: {e}", exc_info=True)
         flash('Error fetching downloads.', 'danger')
         return redirect(url_for('web_routes.dashboard'))
+
+
+def library_page(media_type, cursor=None, limit=LIBRARY_PAGE_SIZE):
+    """Load one page of the library for ``media_type`` as JSON-ready items plus the next page's cursor."""
+    rows, has_more = Media.library_page(media_type, after=decode_cursor(cursor, 2), limit=limit)
+    items = [
+        {
+            'id': row.id,
+            'title': row.title,
+            'release_date': row.release_date.isoformat() if row.release_date else None
+        }
+        for row in rows
+    ]
+    next_cursor = encode_cursor((rows[-1].title, rows[-1].id)) if has_more else None
+    return {'items': items, 'next_cursor': next_cursor}
+
+
 # Route to view the user's library
 @bp.route('/library')
 @login_required
 def library():
     try:
-        all_items = Media.query.order_by(Media.title.asc()).all()
-        movies = [item for item in all_items if item.media_type == 'Movie']
-        tv_shows = [item for item in all_items if item.media_type == 'TV Show']
-        music = [item for item in all_items if item.media_type == 'Music']
-        return render_template('library.html', movies=movies, tv_shows=tv_shows, music=music)
+        # First page of each type; the rest is loaded from /library/items as the user scrolls
+        pages = {media_type: library_page(media_type) for media_type in LIBRARY_MEDIA_TYPES}
+        return render_template('library.html', movies=pages['Movie'], tv_shows=pages['TV Show'], music=pages['Music'])
     except Exception as e:
         current_app.logger.error(f"Error in /library route: {e}")
         flash('Error loading your library.', 'danger')
         return redirect(url_for('web_routes.dashboard'))
 
+
+@bp.route('/library/items')
+@login_required
+def library_items():
+    """One page of the library as JSON. Query parameters: media_type, cursor (from the previous page) and limit."""
+    media_type = request.args.get('media_type', '')
+    if media_type not in LIBRARY_MEDIA_TYPES:
+        return jsonify({"error": f"media_type must be one of {', '.join(LIBRARY_MEDIA_TYPES)}."}), 400
+    limit = min(max(request.args.get('limit', LIBRARY_PAGE_SIZE, type=int), 1), LIBRARY_MAX_PAGE_SIZE)
+    try:
+        return jsonify(library_page(media_type, request.args.get('cursor'), limit))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
 # Route for user profile
 @bp.route('/profile', methods=['GET', 'POST'])
 @login_required
@@ -108,50 +139,15 @@ def profile():
 @login_required
 def process_requests():
     try:
-        tmdb_helper = TMDbHelper()
-        jackett_helper = JackettHelper()
-        qb_helper = QBittorrentHelper()
-        pending_requests = Request.query.filter_by(status='Pending').all()
+        report = process_pending_requests()
 
-        if not pending_requests:
+        if not report.items:
             flash('No pending requests to process.', 'info')
             return redirect(url_for('web_routes.downloads'))
 
-        for req in pending_requests:
-            try:
-                validated_media = tmdb_helper.get_media_details(req.title, req.media_type.lower())
-                if not validated_media:
-                    flash(f"No valid media found for {req.title} on TMDB.", 'warning')
-                    continue
-
-                validated_title = validated_media['title'] if req.media_type == 'Movie' else validated_media['name']
-                release_year = validated_media.get('release_date', '')[:4]
-                search_query = f"{validated_title} {release_year}"
-                search_results = jackett_helper.search_jackett(query=search_query, category=normalize_media_type(req.media_type))
-
-                # Handle case where search_results is None
-                if not search_results:
-                    flash(f"No results found for {validated_title}.", 'info')
-                    continue
-
-                # Fix: Access the magnet link correctly from the dictionary
-                magnet_link = next(
-                    (result['magnet'] for result in search_results if result.get('magnet', '').startswith("magnet:?")),
-                    None
-                )
-                if not magnet_link:
-                    flash(f"No valid magnet link found for {validated_title}.", 'warning')
-                    continue
-
-                download_path = get_download_path(req.title, req.media_type)
-                qb_helper.add_torrent(magnet_link, save_path=download_path)
-                req.status = 'In Progress'
-                db.session.commit()
-                flash(f"Started download for {req.title}.", 'success')
-            except Exception as e:
-                db.session.rollback()
-                logging.error(f"Error processing request {req.title}: {e}", exc_info=True)
-                flash(f"Error processing {req.title}: {e}", 'danger')
+        categories = {'submitted': 'success', 'no_metadata': 'warning', 'no_results': 'info', 'no_magnet': 'warning'}
+        for item in report.items:
+            flash(item.message, categories.get(item.outcome, 'danger'))
 
         return redirect(url_for('web_routes.downloads'))
     except Exception as e:
@@ -163,7 +159,7 @@ def process_requests():
 @login_required
 def pause_download(hash):
     try:
-        qb_helper = QBittorrentHelper()
+        qb_helper = registry.get('qbittorrent')
         qb_helper.qb.torrents_pause(torrent_hashes=hash)
         return jsonify({"message": "Download paused successfully."}), 200
     except Exception as e:
@@ -174,7 +170,7 @@ def pause_download(hash):
 @login_required
 def resume_download(hash):
     try:
-        qb_helper = QBittorrentHelper()
+        qb_helper = registry.get('qbittorrent')
         qb_helper.qb.torrents_resume(torrent_hashes=hash)
         return jsonify({"message": "Download resumed successfully."}), 200
     except Exception as e:
@@ -185,7 +181,7 @@ def resume_download(hash):
 @login_required
 def remove_download(hash):
     try:
-        qb_helper = QBittorrentHelper()
+        qb_helper = registry.get('qbittorrent')
         qb_helper.qb.torrents_delete(torrent_hashes=hash)
         return jsonify({"message": "Download removed successfully."}), 200
     except Exception as e:
@@ -196,7 +192,7 @@ def remove_download(hash):
 @login_required
 def recommendations():
     try:
-        tmdb_helper = TMDbHelper()
+        tmdb_helper = registry.get('tmdb')
         recommendations = []
         for media in Media.query.all():
             media_recommendations = tmdb_helper.get_recommendations(media.title, media.media_type.lower())
@@ -233,39 +229,13 @@ def mark_as_past_recommendation():
 @bp.route('/generate-recommendations', methods=['GET'])
 @login_required
 def generate_recommendations():
-    tmdb_helper = TMDbHelper()
-    media_items = Media.query.all()
-    generated_recommendations = []
-
-    for item in media_items:
-        recommendations = tmdb_helper.get_recommendations(title=item.title, media_type=item.media_type)
-        for rec in recommendations:
-            exists = Recommendation.query.filter_by(
-                user_id=current_user.id,
-                title=rec['title']
-            ).first()
-
-            if not exists:
-                new_recommendation = Recommendation(
-                    user_id=current_user.id,
-                    title=rec['title'],
-                    media_type=item.media_type,
-                    description=rec.get('overview', 'No description available.')
-                )
-                db.session.add(new_recommendation)
-                generated_recommendations.append({
-                    'original_title': item.title,
-                    'recommended_title': rec['title'],
-                    'media_type': item.media_type
-                })
-
     try:
-        db.session.commit()
+        generated_recommendations = recommendation_generator.generate_recommendations([current_user.id])
         flash('Recommendations generated successfully!', 'success')
-    except Exception as e:
+    except SQLAlchemyError as e:
         logging.error(f"Error storing recommendations: {e}", exc_info=True)
-        db.session.rollback()
         flash('Error storing recommendations.', 'danger')
+        generated_recommendations = []
 
     if not generated_recommendations:
         flash("No recommendations were found.", "info")
@@ -274,42 +244,45 @@ def generate_recommendations():
     return render_template('recommendations.html', recommendations=generated_recommendations)
 
 
+# Recommendation bulk actions -> set-based statement applying them for the current user
+BULK_ACTIONS = {
+    'add_request': Recommendation.add_requests,
+    'ignore': Recommendation.ignore,
+}
+BULK_MAX_IDS = 1000
+
+
+def parse_recommendation_ids(values):
+    """Convert a list of submitted recommendation IDs to a de-duplicated list of ints. Raises ValueError."""
+    if not isinstance(values, list):
+        raise ValueError("ids must be a list.")
+    ids = list(dict.fromkeys(int(value) for value in values))
+    if len(ids) > BULK_MAX_IDS:
+        raise ValueError(f"At most {BULK_MAX_IDS} recommendations can be changed at once.")
+    return ids
+
+
 @bp.route('/bulk_action', methods=['POST'])
 @login_required
 def bulk_action():
-    selected_ids = request.form.getlist("selected_recommendations")
     action = request.form.get("action")
+    try:
+        selected_ids = parse_recommendation_ids(request.form.getlist("selected_recommendations"))
+    except ValueError as e:
+        flash(f"Invalid selection: {e}", "danger")
+        return redirect(url_for('web_routes.recommendations'))
 
     if not selected_ids:
         flash("No recommendations selected.", "info")
         return redirect(url_for('web_routes.recommendations'))
+    if action not in BULK_ACTIONS:
+        flash(f"Unknown bulk action '{action}'.", "danger")
+        return redirect(url_for('web_routes.recommendations'))
 
     try:
-        if action == "add_request":
-            for recommendation_id in selected_ids:
-                recommendation = Recommendation.query.get(recommendation_id)
-                if recommendation:
-                    new_request = Request(
-                        user_id=current_user.id,
-                        media_type=recommendation.media_type,
-                        title=recommendation.related_media_title,
-                        status='Pending',
-                        priority='Medium'
-                    )
-                    db.session.add(new_request)
-
-        elif action == "ignore":
-            for recommendation_id in selected_ids:
-                recommendation = Recommendation.query.get(recommendation_id)
-                if recommendation:
-                    ignored = IgnoredRecommendation(
-                        recommendation_id=recommendation.id,
-                        user_id=current_user.id
-                    )
-                    db.session.add(ignored)
-
+        changed = BULK_ACTIONS[action](selected_ids, current_user.id)
         db.session.commit()
-        flash(f"Bulk action '{action}' completed successfully.", "success")
+        flash(f"Bulk action '{action}' completed: {changed} of {len(selected_ids)} recommendations applied.", "success")
     except Exception as e:
         logging.error(f"Error in bulk_action: {e}", exc_info=True)
         db.session.rollback()
@@ -318,6 +291,33 @@ def bulk_action():
     return redirect(url_for('web_routes.recommendations'))
 
 
+@bp.route('/recommendations/bulk', methods=['POST'])
+@login_required
+def bulk_action_api():
+    """
+    JSON bulk action on recommendations: {"action": "add_request" | "ignore", "ids": [...]}.
+
+    Responds with how many were applied; the rest already had a request or were already ignored.
+    """
+    data = request.get_json(silent=True) or {}
+    action = data.get('action')
+    if action not in BULK_ACTIONS:
+        return jsonify({"error": f"action must be one of {', '.join(BULK_ACTIONS)}."}), 400
+    try:
+        ids = parse_recommendation_ids(data.get('ids') or [])
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": f"Invalid ids: {e}"}), 400
+
+    try:
+        changed = BULK_ACTIONS[action](ids, current_user.id)
+        db.session.commit()
+    except SQLAlchemyError as e:
+        logging.error(f"Error in bulk action API: {e}", exc_info=True)
+        db.session.rollback()
+        return jsonify({"error": "Error performing bulk action."}), 500
+    return jsonify({"action": action, "selected": len(ids), "applied": changed, "skipped": len(ids) - changed})
+
+
 @bp.route('/previous-recommendations')
 @login_required
 def previous_recommendations():
@@ -485,7 +485,7 @@ def add_to_requests():
 @login_required
 def future_releases():
     try:
-        tmdb_helper = TMDbHelper()
+        tmdb_helper = registry.get('tmdb')
         us_movies = tmdb_helper.get_upcoming_movies(region="US")
         gb_movies = tmdb_helper.get_upcoming_movies(region="GB")
         us_tv_shows = tmdb_helper.get_upcoming_tv_shows()
@@ -531,7 +531,7 @@ def future_releases():
 @login_required
 def search_torrents():
     try:
-        jackett_helper = JackettHelper()
+        jackett_helper = registry.get('jackett')
         results = None
 
         if request.method == 'POST':
@@ -590,7 +590,7 @@ def add_to_downloads():
             flash(str(e), "danger")
             return redirect(url_for('web_routes.search_torrents'))
 
-        qb_helper = QBittorrentHelper()
+        qb_helper = registry.get('qbittorrent')
         qb_helper.add_torrent(magnet_uri, save_path=download_path)
         logging.info(f"Successfully added torrent '{title}' to path '{download_path}'.")
         flash(f"Torrent '{title}' added to downloads successfully.", "success")
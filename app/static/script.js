@@ -1,3 +1,7 @@
+// State of the TMDB search on the requests page
+let excludedIds = [];
+let currentTmdbId = null;
+
 // Helper to retrieve CSRF token
 function getCsrfToken() {
     const token = document.querySelector('meta[name="csrf-token"]')?.getAttribute('content');
@@ -33,12 +37,18 @@ async function fetchWithCSRF(url, method, body = {}) {
     }
 }
 
-// Handle actions with confirmation and status updates
+// Handle download actions (pause, resume, remove) and update the download's row
 async function handleAction(url, hash, newState) {
-    if (!confirmAction('Are you sure you want to perform this action?')) return;
-
     try {
-        const data = await fetchWithCSRF(url, 'POST');
+        const response = await fetch(url, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'X-CSRFToken': getCsrfToken(),
+            },
+        });
+        const data = await response.json();
+
         if (data.message) {
             alert(data.message);
 
@@ -49,9 +59,12 @@ async function handleAction(url, hash, newState) {
                 const statusElement = document.getElementById(`status-${hash}`);
                 if (statusElement) statusElement.innerText = newState;
             }
+        } else if (data.error) {
+            alert('Error: ' + data.error);
         }
     } catch (error) {
-        console.error('Action handling failed:', error);
+        console.error('Error:', error);
+        alert('An error occurred while processing the request.');
     }
 }
 
@@ -144,6 +157,51 @@ function toggleMenu() {
     }
 }
 
+// Infinite scroll: append pages to a list from its data-url while its end is visible
+function initInfiniteList(list) {
+    const sentinel = document.createElement('div');
+    list.after(sentinel);
+    let loading = false;
+
+    const observer = new IntersectionObserver(async entries => {
+        if (!entries[0].isIntersecting || loading) return;
+        const cursor = list.dataset.nextCursor;
+        if (!cursor) {
+            observer.disconnect();
+            return;
+        }
+
+        loading = true;
+        try {
+            const url = new URL(list.dataset.url, window.location.origin);
+            url.searchParams.set('cursor', cursor);
+            const response = await fetch(url);
+            const data = await response.json();
+            if (!response.ok) {
+                throw new Error(data.error || 'Request failed');
+            }
+
+            data.items.forEach(item => {
+                const li = document.createElement('li');
+                li.textContent = item.title;
+                list.appendChild(li);
+            });
+            list.dataset.nextCursor = data.next_cursor || '';
+        } catch (error) {
+            console.error('Loading more items failed:', error);
+            observer.disconnect();
+        } finally {
+            loading = false;
+        }
+        // Keep loading while the end of the list is still on screen
+        if (list.dataset.nextCursor && sentinel.getBoundingClientRect().top < window.innerHeight) {
+            observer.unobserve(sentinel);
+            observer.observe(sentinel);
+        }
+    });
+    observer.observe(sentinel);
+}
+
 // Attach all necessary event listeners after the DOM loads
 document.addEventListener('DOMContentLoaded', () => {
     // Menu toggle listener
@@ -164,6 +222,9 @@ document.addEventListener('DOMContentLoaded', () => {
         darkModeButton.addEventListener('click', toggleDarkMode);
     }
 
+    // Lists that load more items as they are scrolled
+    document.querySelectorAll('.infinite-list').forEach(initInfiniteList);
+
     // Confirmation button listeners
     document.querySelectorAll('.confirm-btn').forEach(button => {
         button.addEventListener('click', event => {
@@ -1,15 +1,205 @@
+import atexit
+import logging
+import os
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta
 from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.schedulers.blocking import BlockingScheduler
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from app.models import db, SchedulerLease
+from app.helpers.job_recorder import record_job
+from config import Config
 
-def schedule_tasks(app):
-    scheduler = BackgroundScheduler()
-    scheduler.init_app(app)
-    scheduler.start()
+logging.basicConfig(level=logging.INFO)
+
+LEADER_LEASE = 'scheduler'
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def daily_recommendations_task():
+    from app.helpers.recommendation_generator import generate_recommendations, active_user_ids
+    with record_job('daily_recommendations_task') as run:
+        with run.stage('db'):
+            user_ids = active_user_ids()
+        generate_recommendations(user_ids, recorder=run)
+
+
+def process_pending_requests_task():
+    from app.routes.request_processing_routes import process_requests_with_jackett_and_qbittorrent
+    with record_job('process_pending_requests_task') as run:
+        report = process_requests_with_jackett_and_qbittorrent()
+        run.add_pipeline_report(report)
+
+
+class DatabaseLease:
+    """Leader lease held in a scheduler_leases row; taking it over is a single conditional UPDATE."""
+
+    def __init__(self, app, name=LEADER_LEASE):
+        self.app = app
+        self.name = name
+
+    def acquire(self, owner, seconds):
+        """Take or renew the lease for ``owner``. Returns True if ``owner`` holds it afterwards."""
+        with self.app.app_context():
+            now = datetime.utcnow()
+            result = db.session.execute(
+                update(SchedulerLease)
+                .where(
+                    SchedulerLease.name == self.name,
+                    (SchedulerLease.owner == owner) | (SchedulerLease.expires_at < now) | SchedulerLease.owner.is_(None)
+                )
+                .values(owner=owner, expires_at=now + timedelta(seconds=seconds))
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount:
+                db.session.commit()
+                return True
+            if db.session.get(SchedulerLease, self.name) is not None:
+                db.session.rollback()
+                return False
+            try:
+                db.session.add(SchedulerLease(name=self.name, owner=owner, expires_at=now + timedelta(seconds=seconds)))
+                db.session.commit()
+                return True
+            except IntegrityError:
+                # Another process created the row first
+                db.session.rollback()
+                return False
+
+    def release(self, owner):
+        with self.app.app_context():
+            db.session.execute(
+                update(SchedulerLease)
+                .where(SchedulerLease.name == self.name, SchedulerLease.owner == owner)
+                .values(owner=None, expires_at=None)
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+
+
+class RedisLease:
+    """Leader lease held in a Redis key with a TTL; renewals check ownership atomically in a Lua script."""
+
+    RENEW = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('pexpire', KEYS[1], ARGV[2]) end return 0"
+    RELEASE = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0"
+
+    def __init__(self, redis_url, name=LEADER_LEASE):
+        import redis  # Only needed when Scheduler.redis_url is set
+        self.client = redis.Redis.from_url(redis_url)
+        self.key = f"phantom-fetch:lease:{name}"
+
+    def acquire(self, owner, seconds):
+        milliseconds = int(seconds * 1000)
+        if self.client.set(self.key, owner, nx=True, px=milliseconds):
+            return True
+        return bool(self.client.eval(self.RENEW, 1, self.key, owner, milliseconds))
+
+    def release(self, owner):
+        self.client.eval(self.RELEASE, 1, self.key, owner)
 
-    # Add the scheduled task
-    scheduler.add_job(
-        func=process_pending_requests_task,
-        trigger="interval",
-        minutes=5,  # Run every 5 minutes
-        id="process_pending_requests_task",
-        replace_existing=True,
-    )
+
+class LeaderElection:
+    """
+    Keeps track of whether this process is the scheduler leader.
+
+    heartbeat() takes or renews the lease and should run every third of the lease;
+    is_leader() is a local check that stays true only until the lease this process last
+    saw would have expired, so a stalled leader stops running jobs before another
+    process can take over.
+    """
+
+    def __init__(self, lease, seconds):
+        self.lease = lease
+        self.seconds = seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._valid_until = None
+
+    def heartbeat(self):
+        renewed_at = datetime.utcnow()
+        was_leader = self.is_leader()
+        try:
+            leader = self.lease.acquire(self.owner, self.seconds)
+        except Exception as e:
+            logging.error(f"Error renewing scheduler lease: {e}")
+            leader = False
+        self._valid_until = renewed_at + timedelta(seconds=self.seconds) if leader else None
+        if leader != was_leader:
+            logging.info(f"Scheduler {self.owner} {'is now' if leader else 'is no longer'} the leader.")
+
+    def is_leader(self):
+        return self._valid_until is not None and datetime.utcnow() < self._valid_until
+
+    def release(self):
+        if self._valid_until is None:
+            return
+        self._valid_until = None
+        try:
+            self.lease.release(self.owner)
+        except Exception as e:
+            logging.error(f"Error releasing scheduler lease: {e}")
+
+
+def leader_job(app, election, func):
+    """Wrap a task so it runs inside the app context, and only on the leader."""
+    def run():
+        if not election.is_leader():
+            return
+        with app.app_context():
+            try:
+                func()
+            except Exception as e:
+                app.logger.error(f"Error running {func.__name__}: {e}")
+    run.__name__ = func.__name__
+    return run
+
+
+def start_scheduler(app, blocking=False):
+    """
+    Start the job scheduler for this process, at most once.
+
+    Every process that calls this competes for the leader lease (Redis when
+    Scheduler.redis_url is set, otherwise a database row); only the leader runs
+    jobs, and each job runs one instance at a time with missed runs coalesced.
+
+    Args:
+        app (Flask): Application the jobs run against.
+        blocking (bool): Run the scheduler in the calling thread (for worker.py).
+
+    Returns:
+        The started scheduler (returns only after shutdown when ``blocking``).
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is not None:
+            return _scheduler
+
+        settings = Config().sections['Scheduler']
+        lease = RedisLease(settings.redis_url) if settings.redis_url else DatabaseLease(app)
+        election = LeaderElection(lease, settings.lease_seconds)
+        election.heartbeat()
+        atexit.register(election.release)
+
+        scheduler = BlockingScheduler() if blocking else BackgroundScheduler()
+        job_defaults = {'max_instances': 1, 'coalesce': True, 'misfire_grace_time': 60, 'replace_existing': True}
+        scheduler.add_job(
+            election.heartbeat, 'interval', seconds=max(1, settings.lease_seconds // 3),
+            id='leader_heartbeat', **job_defaults
+        )
+        scheduler.add_job(
+            leader_job(app, election, daily_recommendations_task), 'interval',
+            hours=settings.recommendations_interval_hours, id='daily_recommendations_task', **job_defaults
+        )
+        scheduler.add_job(
+            leader_job(app, election, process_pending_requests_task), 'interval',
+            minutes=settings.requests_interval_minutes, id='process_pending_requests_task', **job_defaults
+        )
+        _scheduler = scheduler
+
+    logging.info(f"Starting {'blocking' if blocking else 'background'} scheduler as {election.owner}.")
+    scheduler.start()
+    return scheduler
@@ -1,40 +1,308 @@
 import os
+import logging
+import threading
+import time
 import yaml
+from dataclasses import MISSING, dataclass, fields
 
 # Load configuration from the YAML file
 CONFIG_PATH = 'config.yaml'
 WTF_CSRF_TRUSTED_ORIGINS = ['http://127.0.0.1:5000', 'http://10.252.0.4:5000']
 WTF_CSRF_ENABLED = True
 
+# Seconds between checks of config.yaml's modification time
+RELOAD_CHECK_INTERVAL = 2.0
+# Sections that are read once by create_app() and only take effect after a restart
+RESTART_SECTIONS = ('Database', 'Secret_key', 'Scheduler', 'Async')
+
+
+@dataclass(frozen=True)
+class QBittorrentSettings:
+    host: str
+    username: str
+    password: str
+
+
+@dataclass(frozen=True)
+class JackettSettings:
+    server_url: str
+    api_key: str
+    categories: dict
+
+
+@dataclass(frozen=True)
+class JellyfinSettings:
+    server_url: str
+    api_key: str
+    webhook_secret: str = None
+
+
+@dataclass(frozen=True)
+class SpotifySettings:
+    client_id: str
+    client_secret: str
+    cache_ttl: int = 3600
+    lookup_max_age_days: int = 30
+
+
+@dataclass(frozen=True)
+class MicrosoftGraphSettings:
+    client_id: str
+    tenant_id: str
+    scopes: list
+    cache_file_path: str
+    processed_retention_days: int = 30
+    extract_workers: int = 0
+
+
+@dataclass(frozen=True)
+class TMDbSettings:
+    api_key: str
+
+
+SQLITE_JOURNAL_MODES = ('DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF')
+SQLITE_SYNCHRONOUS_LEVELS = ('OFF', 'NORMAL', 'FULL', 'EXTRA')
+
+
+@dataclass(frozen=True)
+class DatabaseSettings:
+    uri: str
+    track_modifications: bool = False
+    # Connection pool for server databases (MySQL/MariaDB, PostgreSQL)
+    pool_size: int = 10
+    max_overflow: int = 20
+    pool_timeout: int = 30
+    pool_recycle: int = 1800
+    pool_pre_ping: bool = True
+    # Pragmas set on every new SQLite connection
+    sqlite_journal_mode: str = 'WAL'
+    sqlite_synchronous: str = 'NORMAL'
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_mmap_size: int = 268435456
+
+    def __post_init__(self):
+        if self.sqlite_journal_mode.upper() not in SQLITE_JOURNAL_MODES:
+            raise ValueError(f"config.yaml 'Database.sqlite_journal_mode' must be one of {', '.join(SQLITE_JOURNAL_MODES)}.")
+        if self.sqlite_synchronous.upper() not in SQLITE_SYNCHRONOUS_LEVELS:
+            raise ValueError(f"config.yaml 'Database.sqlite_synchronous' must be one of {', '.join(SQLITE_SYNCHRONOUS_LEVELS)}.")
+
+
+@dataclass(frozen=True)
+class PipelineSettings:
+    validate_workers: int = 20
+    search_workers: int = 3
+    rank_workers: int = 1
+    submit_workers: int = 2
+    queue_size: int = 50
+    persist_batch_size: int = 50
+    claim_batch_size: int = 100
+    lease_seconds: int = 600
+
+
+@dataclass(frozen=True)
+class SchedulerSettings:
+    run_in_web: bool = True
+    lease_seconds: int = 60
+    redis_url: str = None
+    requests_interval_minutes: int = 5
+    recommendations_interval_hours: int = 24
+
+
+@dataclass(frozen=True)
+class HttpSettings:
+    pool_size: int = 10
+    hosts_per_service: int = 4
+
+
+@dataclass(frozen=True)
+class AsyncSettings:
+    connections: int = 100
+    connections_per_host: int = 20
+
+
+SECTIONS = {
+    'qBittorrent': QBittorrentSettings,
+    'Jackett': JackettSettings,
+    'Jellyfin': JellyfinSettings,
+    'Spotify': SpotifySettings,
+    'MicrosoftGraph': MicrosoftGraphSettings,
+    'TMDb': TMDbSettings,
+    'Database': DatabaseSettings,
+    'Pipeline': PipelineSettings,
+    'Scheduler': SchedulerSettings,
+    'Http': HttpSettings,
+    'Async': AsyncSettings,
+}
+# Sections that may be left out of config.yaml entirely
+OPTIONAL_SECTIONS = ('Pipeline', 'Scheduler', 'Http', 'Async')
+
+
+def parse_section(name, settings_class, values):
+    """
+    Validate one config.yaml section into its settings dataclass.
+
+    Missing required keys and values of the wrong type raise ValueError; keys with
+    defaults may be omitted. Numeric strings are accepted for int fields.
+    """
+    if not isinstance(values, dict):
+        raise ValueError(f"config.yaml section '{name}' is missing or is not a mapping.")
+    parsed = {}
+    for field in fields(settings_class):
+        if field.name not in values or values[field.name] is None:
+            if field.default is MISSING:
+                raise ValueError(f"config.yaml is missing '{name}.{field.name}'.")
+            continue
+        value = values[field.name]
+        if field.type is int and not isinstance(value, bool):
+            try:
+                value = int(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"config.yaml '{name}.{field.name}' must be an integer, got {value!r}.")
+        elif field.type is bool and not isinstance(value, bool):
+            raise ValueError(f"config.yaml '{name}.{field.name}' must be true or false, got {value!r}.")
+        elif field.type in (dict, list) and not isinstance(value, field.type):
+            raise ValueError(f"config.yaml '{name}.{field.name}' must be a {field.type.__name__}.")
+        parsed[field.name] = value
+    return settings_class(**parsed)
+
+
 class Config:
-    def __init__(self):
-        with open(CONFIG_PATH, 'r') as file:
-            config = yaml.safe_load(file)
-        
-        self.QB_API_URL = config['qBittorrent']['host']
-        self.QB_USERNAME = config['qBittorrent']['username']
-        self.QB_PASSWORD = config['qBittorrent']['password']
-        
-        self.JACKETT_API_URL = config['Jackett']['server_url']
-        self.JACKETT_API_KEY = config['Jackett']['api_key']
-        self.JACKETT_CATEGORIES = config['Jackett']['categories']
-        
-        self.JELLYFIN_API_KEY = config['Jellyfin']['api_key']
-        self.JELLYFIN_SERVER_URL = config['Jellyfin']['server_url']
-        
-        self.SPOTIFY_CLIENT_ID = config['Spotify']['client_id']
-        self.SPOTIFY_CLIENT_SECRET = config['Spotify']['client_secret']
-        
-        self.OUTLOOK_CLIENT_ID = config['MicrosoftGraph']['client_id']
-        self.OUTLOOK_TENANT_ID = config['MicrosoftGraph']['tenant_id']
-        self.OUTLOOK_SCOPES = config['MicrosoftGraph']['scopes']
-        self.OUTLOOK_CACHE_FILE_PATH = config['MicrosoftGraph']['cache_file_path']
-        
-        self.TMDB_API_KEY = config['TMDb']['api_key']
-        
+    """
+    Application settings from config.yaml.
+
+    ``Config()`` returns the cached snapshot for the file's current contents rather
+    than re-reading it; see ConfigStore. Snapshots are shared, so treat them as read-only.
+    """
+
+    def __new__(cls):
+        return config_store.current()
+
+    @classmethod
+    def _from_yaml(cls, raw):
+        """Build a snapshot from parsed YAML, validating every section."""
+        config = object.__new__(cls)
+        config.sections = {
+            name: parse_section(name, settings, raw.get(name) or ({} if name in OPTIONAL_SECTIONS else None))
+            for name, settings in SECTIONS.items()
+        }
+        config.raw = raw
+
+        qbittorrent = config.sections['qBittorrent']
+        config.QB_API_URL = qbittorrent.host
+        config.QB_USERNAME = qbittorrent.username
+        config.QB_PASSWORD = qbittorrent.password
+
+        jackett = config.sections['Jackett']
+        config.JACKETT_API_URL = jackett.server_url
+        config.JACKETT_API_KEY = jackett.api_key
+        config.JACKETT_CATEGORIES = jackett.categories
+
+        jellyfin = config.sections['Jellyfin']
+        config.JELLYFIN_API_KEY = jellyfin.api_key
+        config.JELLYFIN_SERVER_URL = jellyfin.server_url
+        config.JELLYFIN_WEBHOOK_SECRET = jellyfin.webhook_secret
+
+        spotify = config.sections['Spotify']
+        config.SPOTIFY_CLIENT_ID = spotify.client_id
+        config.SPOTIFY_CLIENT_SECRET = spotify.client_secret
+        config.SPOTIFY_CACHE_TTL = spotify.cache_ttl
+        config.SPOTIFY_LOOKUP_MAX_AGE_DAYS = spotify.lookup_max_age_days
+
+        graph = config.sections['MicrosoftGraph']
+        config.OUTLOOK_CLIENT_ID = graph.client_id
+        config.OUTLOOK_TENANT_ID = graph.tenant_id
+        config.OUTLOOK_SCOPES = graph.scopes
+        config.OUTLOOK_CACHE_FILE_PATH = graph.cache_file_path
+        config.OUTLOOK_PROCESSED_RETENTION_DAYS = graph.processed_retention_days
+        config.OUTLOOK_EXTRACT_WORKERS = graph.extract_workers
+
+        config.TMDB_API_KEY = config.sections['TMDb'].api_key
+
         # Database Configuration
-        self.SQLALCHEMY_DATABASE_URI = config['Database']['uri']
-        self.SQLALCHEMY_TRACK_MODIFICATIONS = config['Database']['track_modifications']
-        
+        database = config.sections['Database']
+        config.SQLALCHEMY_DATABASE_URI = database.uri
+        config.SQLALCHEMY_TRACK_MODIFICATIONS = database.track_modifications
+
         # Ensure the correct key casing for SECRET_KEY
-        self.SECRET_KEY = config['Secret_key']  # Correctly matches the YAML key
+        config.SECRET_KEY = raw.get('Secret_key')  # Correctly matches the YAML key
+        return config
+
+    def section(self, name):
+        """Return the raw mapping for a config.yaml section, or {} if it is absent (for optional sections)."""
+        return self.raw.get(name) or {}
+
+
+class ConfigStore:
+    """
+    Caches the parsed config.yaml and reloads it when the file's mtime changes.
+
+    The mtime is checked at most every RELOAD_CHECK_INTERVAL seconds. A reload that
+    fails to parse or validate is logged and the previous snapshot is kept. After a
+    successful reload, callbacks subscribed to a changed section are called with the
+    new Config so helpers can rebuild their clients.
+    """
+
+    def __init__(self, path=CONFIG_PATH, check_interval=RELOAD_CHECK_INTERVAL):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._config = None
+        self._mtime = None
+        self._checked_at = 0.0
+        self._subscribers = {}
+
+    def current(self):
+        """Return the current Config snapshot, reloading it first if the file changed."""
+        if self._config is None or time.monotonic() - self._checked_at >= self.check_interval:
+            self.check()
+        return self._config
+
+    def check(self):
+        """Reload config.yaml if its mtime changed since the last load."""
+        with self._lock:
+            self._checked_at = time.monotonic()
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except OSError as e:
+                if self._config is None:
+                    raise
+                logging.error(f"Error checking {self.path}: {e}")
+                return
+            if mtime == self._mtime:
+                return
+
+            try:
+                with open(self.path, 'r') as file:
+                    config = Config._from_yaml(yaml.safe_load(file) or {})
+            except (yaml.YAMLError, ValueError) as e:
+                if self._config is None:
+                    raise
+                logging.error(f"Ignoring invalid {self.path}; keeping the previous configuration: {e}")
+                self._mtime = mtime
+                return
+
+            previous, self._config, self._mtime = self._config, config, mtime
+        if previous is not None:
+            logging.info(f"Reloaded {self.path}.")
+            self._notify(previous, config)
+
+    def subscribe(self, section, callback):
+        """Call ``callback(config)`` whenever ``section`` changes on reload."""
+        with self._lock:
+            self._subscribers.setdefault(section, []).append(callback)
+
+    def _notify(self, previous, config):
+        for name in set(SECTIONS) | set(config.raw) | set(previous.raw):
+            if previous.raw.get(name) == config.raw.get(name):
+                continue
+            if name in RESTART_SECTIONS:
+                logging.warning(f"config.yaml '{name}' changed; restart the application to apply it.")
+            for callback in list(self._subscribers.get(name, ())):
+                try:
+                    callback(config)
+                except Exception as e:
+                    logging.error(f"Error applying '{name}' configuration change: {e}")
+
+
+# Shared per-process configuration; Config() reads from it
+config_store = ConfigStore()
@@ -0,0 +1,70 @@
+"""Add request pipeline lease and retry columns
+
+Revision ID: 3f6a1c9d2b7e
+Revises:
+Create Date: 2026-10-19 09:12:00.000000
+
+Databases created before the request pipeline have a requests table without the
+lease and retry columns (db.create_all() only creates missing tables). Columns that
+already exist, e.g. on databases created by a newer create_all(), are left alone.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f6a1c9d2b7e'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+OLD_STATUSES = ('Pending', 'In Progress', 'Completed', 'Failed')
+NEW_STATUSES = ('Pending', 'Waiting', 'In Progress', 'Completed', 'Failed')
+
+COLUMNS = (
+    sa.Column('lease_owner', sa.String(length=128), nullable=True),
+    sa.Column('lease_expires_at', sa.TIMESTAMP(), nullable=True),
+    sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+    sa.Column('last_error', sa.String(length=255), nullable=True),
+    sa.Column('next_attempt_at', sa.TIMESTAMP(), nullable=True),
+)
+
+
+def _existing_columns():
+    return {column['name'] for column in sa.inspect(op.get_bind()).get_columns('requests')}
+
+
+def _is_mysql():
+    return op.get_bind().dialect.name in ('mysql', 'mariadb')
+
+
+def upgrade():
+    existing = _existing_columns()
+    for column in COLUMNS:
+        if column.name not in existing:
+            op.add_column('requests', column.copy())
+
+    # SQLite stores the Enum as VARCHAR without a constraint, so only MySQL needs the new value
+    if _is_mysql():
+        op.alter_column(
+            'requests', 'status',
+            existing_type=sa.Enum(*OLD_STATUSES), type_=sa.Enum(*NEW_STATUSES),
+            existing_nullable=True, existing_server_default=sa.text("'Pending'")
+        )
+
+
+def downgrade():
+    if _is_mysql():
+        op.execute("UPDATE requests SET status = 'Pending' WHERE status = 'Waiting'")
+        op.alter_column(
+            'requests', 'status',
+            existing_type=sa.Enum(*NEW_STATUSES), type_=sa.Enum(*OLD_STATUSES),
+            existing_nullable=True, existing_server_default=sa.text("'Pending'")
+        )
+
+    existing = _existing_columns()
+    with op.batch_alter_table('requests') as batch_op:
+        for column in reversed(COLUMNS):
+            if column.name in existing:
+                batch_op.drop_column(column.name)
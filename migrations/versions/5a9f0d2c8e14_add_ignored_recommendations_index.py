@@ -0,0 +1,35 @@
+"""Add the lookup index used when ignoring recommendations in bulk
+
+Revision ID: 5a9f0d2c8e14
+Revises: d41b6e93a7c5
+Create Date: 2026-10-19 12:20:00.000000
+
+ignored_recommendations (recommendation_id, user_id) serves the NOT EXISTS check of
+Recommendation.ignore.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5a9f0d2c8e14'
+down_revision = 'd41b6e93a7c5'
+branch_labels = None
+depends_on = None
+
+INDEX = 'ix_ignored_recommendations_recommendation_user'
+
+
+def _existing_indexes():
+    return {index['name'] for index in sa.inspect(op.get_bind()).get_indexes('ignored_recommendations')}
+
+
+def upgrade():
+    if INDEX not in _existing_indexes():
+        op.create_index(INDEX, 'ignored_recommendations', ['recommendation_id', 'user_id'])
+
+
+def downgrade():
+    if INDEX in _existing_indexes():
+        op.drop_index(INDEX, table_name='ignored_recommendations')
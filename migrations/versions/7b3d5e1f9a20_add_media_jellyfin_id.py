@@ -0,0 +1,50 @@
+"""Add the Jellyfin item ID to media
+
+Revision ID: 7b3d5e1f9a20
+Revises: 5a9f0d2c8e14
+Create Date: 2026-10-19 14:05:00.000000
+
+Databases created before the Jellyfin sync upserted by item ID have a media table
+without jellyfin_id (db.create_all() only creates missing tables), so every Media
+query fails there. The column and its unique index are only added when missing.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7b3d5e1f9a20'
+down_revision = '5a9f0d2c8e14'
+branch_labels = None
+depends_on = None
+
+INDEX = 'uq_media_jellyfin_id'
+
+
+def _has_column():
+    return 'jellyfin_id' in {column['name'] for column in sa.inspect(op.get_bind()).get_columns('media')}
+
+
+def _is_unique():
+    """Whether jellyfin_id already has a unique index or constraint (e.g. from db.create_all())."""
+    inspector = sa.inspect(op.get_bind())
+    unique = [index['column_names'] for index in inspector.get_indexes('media') if index['unique']]
+    unique += [constraint['column_names'] for constraint in inspector.get_unique_constraints('media')]
+    return ['jellyfin_id'] in unique
+
+
+def upgrade():
+    if not _has_column():
+        op.add_column('media', sa.Column('jellyfin_id', sa.String(length=64), nullable=True))
+    if not _is_unique():
+        op.create_index(INDEX, 'media', ['jellyfin_id'], unique=True)
+
+
+def downgrade():
+    if not _has_column():
+        return
+    if INDEX in {index['name'] for index in sa.inspect(op.get_bind()).get_indexes('media')}:
+        op.drop_index(INDEX, table_name='media')
+    with op.batch_alter_table('media') as batch_op:
+        batch_op.drop_column('jellyfin_id')
@@ -0,0 +1,50 @@
+"""Add composite indexes for hot request, media and recommendation queries
+
+Revision ID: 8c2e4b7a5d91
+Revises: 3f6a1c9d2b7e
+Create Date: 2026-10-19 09:40:00.000000
+
+- requests (status, requested_at): status filters ordered by request time
+- requests (requested_at): the most recent requests (/requests, notifications)
+- requests (status, next_attempt_at): the pipeline's claim query
+- requests (title, media_type) and media (title, media_type): duplicate and library lookups
+- recommendations / past_recommendations (media_title, related_media_title): recommendation_exists
+
+Indexes that already exist (e.g. created by db.create_all() on a new database) are skipped.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c2e4b7a5d91'
+down_revision = '3f6a1c9d2b7e'
+branch_labels = None
+depends_on = None
+
+INDEXES = (
+    ('ix_requests_status_requested_at', 'requests', ['status', 'requested_at']),
+    ('ix_requests_requested_at', 'requests', ['requested_at']),
+    ('ix_requests_status_next_attempt', 'requests', ['status', 'next_attempt_at']),
+    ('ix_requests_title_media_type', 'requests', ['title', 'media_type']),
+    ('ix_media_title_media_type', 'media', ['title', 'media_type']),
+    ('ix_recommendations_media_related', 'recommendations', ['media_title', 'related_media_title']),
+    ('ix_past_recommendations_media_related', 'past_recommendations', ['media_title', 'related_media_title']),
+)
+
+
+def _existing_indexes(table):
+    return {index['name'] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        if name not in _existing_indexes(table):
+            op.create_index(name, table, columns)
+
+
+def downgrade():
+    for name, table, columns in reversed(INDEXES):
+        if name in _existing_indexes(table):
+            op.drop_index(name, table_name=table)
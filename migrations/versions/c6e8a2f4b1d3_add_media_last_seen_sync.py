@@ -0,0 +1,35 @@
+"""Add the full-sync token to media
+
+Revision ID: c6e8a2f4b1d3
+Revises: 7b3d5e1f9a20
+Create Date: 2026-10-19 14:30:00.000000
+
+A full Jellyfin sync stamps every item it returns with the sync's token in
+last_seen_sync, then marks rows with any other token 'Unavailable' in one UPDATE.
+The column is only added when missing.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c6e8a2f4b1d3'
+down_revision = '7b3d5e1f9a20'
+branch_labels = None
+depends_on = None
+
+
+def _has_column():
+    return 'last_seen_sync' in {column['name'] for column in sa.inspect(op.get_bind()).get_columns('media')}
+
+
+def upgrade():
+    if not _has_column():
+        op.add_column('media', sa.Column('last_seen_sync', sa.String(length=32), nullable=True))
+
+
+def downgrade():
+    if _has_column():
+        with op.batch_alter_table('media') as batch_op:
+            batch_op.drop_column('last_seen_sync')
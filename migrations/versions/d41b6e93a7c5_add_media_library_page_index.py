@@ -0,0 +1,35 @@
+"""Add the keyset pagination index for library pages
+
+Revision ID: d41b6e93a7c5
+Revises: 8c2e4b7a5d91
+Create Date: 2026-10-19 11:05:00.000000
+
+media (media_type, status, title, id) serves Media.library_page: equality on type and
+status, then a range scan in (title, id) order starting after the previous page.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd41b6e93a7c5'
+down_revision = '8c2e4b7a5d91'
+branch_labels = None
+depends_on = None
+
+INDEX = 'ix_media_library_page'
+
+
+def _existing_indexes():
+    return {index['name'] for index in sa.inspect(op.get_bind()).get_indexes('media')}
+
+
+def upgrade():
+    if INDEX not in _existing_indexes():
+        op.create_index(INDEX, 'media', ['media_type', 'status', 'title', 'id'])
+
+
+def downgrade():
+    if INDEX in _existing_indexes():
+        op.drop_index(INDEX, table_name='media')
@@ -0,0 +1,44 @@
+"""Allow requests without a user
+
+Revision ID: e2f7c9b3a8d4
+Revises: c6e8a2f4b1d3
+Create Date: 2026-10-19 15:10:00.000000
+
+Requests ingested from email have no user, but databases created by an older
+db.create_all() declared requests.user_id NOT NULL, so those inserts failed there.
+Databases where the column already allows NULL are left alone.
+
+"""
+import logging
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2f7c9b3a8d4'
+down_revision = 'c6e8a2f4b1d3'
+branch_labels = None
+depends_on = None
+
+
+def _user_id_nullable():
+    columns = {column['name']: column for column in sa.inspect(op.get_bind()).get_columns('requests')}
+    return columns['user_id']['nullable']
+
+
+def upgrade():
+    if not _user_id_nullable():
+        with op.batch_alter_table('requests') as batch_op:
+            batch_op.alter_column('user_id', existing_type=sa.Integer(), nullable=True)
+
+
+def downgrade():
+    if not _user_id_nullable():
+        return
+    if op.get_bind().execute(sa.text("SELECT COUNT(*) FROM requests WHERE user_id IS NULL")).scalar():
+        logging.getLogger('alembic.runtime.migration').warning(
+            "requests.user_id is left nullable: requests without a user exist."
+        )
+        return
+    with op.batch_alter_table('requests') as batch_op:
+        batch_op.alter_column('user_id', existing_type=sa.Integer(), nullable=False)
@@ -0,0 +1,49 @@
+"""
+Send Jellyfin webhook plugin style notifications to a local instance of the app.
+
+Example:
+    python scripts/fake_jellyfin_webhook.py --event ItemAdded --item-id abc123 --name "Dune" --type Movie --year 2021
+"""
+import argparse
+import json
+import requests
+
+
+def build_payload(event, item_id, name, item_type, year=None, overview=None, path=None):
+    """Build a payload shaped like the webhook plugin's generic JSON template."""
+    payload = {
+        "NotificationType": event,
+        "ItemId": item_id,
+        "ItemType": item_type,
+        "Name": name
+    }
+    if year:
+        payload["Year"] = year
+    if overview:
+        payload["Overview"] = overview
+    if path:
+        payload["Path"] = path
+    return payload
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Send a fake Jellyfin webhook notification.")
+    parser.add_argument("--url", default="http://127.0.0.1:5000/jellyfin/webhook", help="Webhook endpoint URL")
+    parser.add_argument("--token", default="", help="Value for the X-Webhook-Token header")
+    parser.add_argument("--event", default="ItemAdded", choices=["ItemAdded", "ItemUpdated", "ItemDeleted"])
+    parser.add_argument("--item-id", required=True, help="Jellyfin item ID")
+    parser.add_argument("--name", default="", help="Item name")
+    parser.add_argument("--type", default="Movie", help="Jellyfin item type (Movie, Series, ...)")
+    parser.add_argument("--year", type=int, help="Production year")
+    parser.add_argument("--overview", help="Item overview")
+    parser.add_argument("--path", help="Item path")
+    args = parser.parse_args()
+
+    payload = build_payload(args.event, args.item_id, args.name, args.type, args.year, args.overview, args.path)
+    headers = {"X-Webhook-Token": args.token} if args.token else {}
+    response = requests.post(args.url, json=payload, headers=headers, timeout=10)
+    print(f"{response.status_code}: {json.dumps(response.json(), indent=2) if response.content else ''}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,15 @@
+"""
+Run the background jobs without a web server.
+
+Set Scheduler.run_in_web to false in config.yaml so web processes stop scheduling,
+then start one or more of these; only the leader runs jobs at any time.
+
+    python worker.py
+"""
+from app import create_app
+from app.tasks.schedule_task import start_scheduler
+
+app = create_app(start_scheduler=False)
+
+if __name__ == "__main__":
+    start_scheduler(app, blocking=True)